@@ -9,3 +9,6 @@ class DmpModel(model.Model):
     event_end = Any(None).tag(sync=True)
     username = Any(None).tag(sync=True)
     password = Any(None).tag(sync=True)
+    dry_run = Any(False).tag(sync=True)
+    monitor = Any(False).tag(sync=True)
+    zones_file = Any(None).tag(sync=True)
@@ -1 +1,2 @@
 from .directory import *
+from .dpm import *
@@ -1,13 +1,20 @@
 from pathlib import Path
 
 project_dir = Path("~", "test_dpm").expanduser()
-tmp_dir = "/ram/process_tmp"
-Path(tmp_dir).mkdir(parents=True, exist_ok=True)
+ram_dir = "/ram"
 
 
 result_dir = Path.home() / f"module_results/Damage_Proxy_Maps"
 result_dir.mkdir(parents=True, exist_ok=True)
 
+# shared between all the projects
+cache_dir = result_dir / ".cache"
+cache_dir.mkdir(parents=True, exist_ok=True)
+
+# temporary storage tiers from the fastest to the slowest: ramdisk, local disk and
+# result disk, the missing ones are skipped
+tmp_tiers = [Path(ram_dir), Path("/tmp"), result_dir / ".tmp"]
+
 
 process = """  
 ## Processing
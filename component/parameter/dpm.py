@@ -0,0 +1,85 @@
+# coherence drop above which a pixel is flagged as damaged
+ccd_threshold = 0.27
+
+# buffer around the AOI in metres, the bursts and pixels outside of it are not
+# processed
+aoi_buffer = 0
+
+# disk space needed per SLC scene (download and ARD products) in GB
+slc_disk_size = 8
+
+# number of tracks that can run their ARD processing at the same time
+# and number of tracks that can download at the same time
+track_cpu_slots = 1
+track_io_slots = 2
+
+# overlap the downloads of a track with its ARD processing, the queue bounds the
+# number of downloaded acquisitions waiting to be processed
+ard_pipeline = False
+pipeline_queue = 1
+
+# disk quota of the SLC and burst ARD cache shared by all the projects in GB,
+# the least recently used products are evicted above it
+cache_quota = 200
+
+# ASF availability check
+asf_url = "https://datapool.asf.alaska.edu/SLC/SA/{}.zip"
+asf_workers = 16
+asf_timeout = 60
+asf_cache_ttl = 30 * 24 * 3600  # in seconds
+
+# block size of the tiled outputs
+block_size = 512
+
+# formats of the damaged points export, ".parquet" (GeoParquet) and/or ".geojson"
+points_formats = [".parquet"]
+
+# damage clusters of connected pixels, smallest cluster (in pixels) and CCD
+# percentile reported for each cluster
+cluster_min_pixels = 4
+cluster_percentile = 90
+
+# colour ramp of the damage proxy map, CCD breakpoints (in %) and their RGBA
+# colours, the values in between are linearly interpolated
+colour_breakpoints = [0, 27, 35, 43, 51, 59, 255]
+colour_ramp = [
+    (0, 0, 0, 0),
+    (253, 246, 50, 255),
+    (253, 169, 50, 255),
+    (253, 100, 50, 255),
+    (253, 50, 50, 255),
+    (255, 10, 10, 255),
+    (253, 0, 0, 255),
+]
+
+# days before today for which the hub inventory is considered incomplete
+inventory_cache_lag = 3
+
+# footprint model used to plan the processing
+slc_size = 4.5  # average size of an IW SLC scene in GB
+slc_bursts = 27  # 3 sub-swaths of 9 bursts
+burst_ard_minutes = 6  # ARD and coherence of a single burst and date on 1 worker
+
+# resources needed to process a single burst in parallel with the others
+burst_cpus = 4
+burst_memory = 12  # in GB
+burst_tmp = 4  # in GB of temporary files
+
+# space left free on each temporary storage tier in GB
+tmp_headroom = 1
+
+# creation options of the Cloud Optimized GeoTIFF outputs
+cog_options = [
+    "COMPRESS=DEFLATE",
+    "PREDICTOR=YES",
+    "NUM_THREADS=ALL_CPUS",
+    f"BLOCKSIZE={block_size}",
+    "OVERVIEWS=AUTO",
+    "OVERVIEW_RESAMPLING=NEAREST",
+    "BIGTIFF=IF_SAFER",
+]
+
+# web tiles output
+tile_size = 256
+tiles_zoom_levels = 7  # number of zoom levels below the native resolution one
+kmz_from_tiles = True  # build the KMZ from the web tiles instead of GDAL
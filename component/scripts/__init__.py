@@ -1 +1,70 @@
-from .process import *
+"""
+The processing functions of the module.
+
+They depend on the heavy geospatial stack (ost, gdal, rasterio, geopandas...) so
+their modules are only imported when one of their names is first accessed (PEP
+562), the interface can then be displayed before they are loaded.
+"""
+
+import importlib
+
+from .startup import report_startup, warm_up
+
+# the public names of each module
+_exports = {
+    "areas": ["earth_radius", "pixel_areas"],
+    "asf": ["cache_file", "check_products_on_asf", "check_product_on_asf"],
+    "cache": ["ProductCache", "product_cache"],
+    "ccd": ["compute_ccd", "ccd_bursts"],
+    "clusters": ["damage_clusters", "export_clusters"],
+    "colour": ["colour_lut", "open_dpm", "write_dpm", "colour_dpm"],
+    "export": ["to_cog", "export_kmz"],
+    "inventory": ["aoi_key", "cached_search"],
+    "jobs": ["ProgressOutput", "DmpJob", "JobQueue", "job_queue"],
+    "manifest": ["fingerprint", "hash_params", "Manifest"],
+    "monitor": ["CoherenceHistory", "monitor_dmp"],
+    "mosaic": ["mosaic_to_aoi"],
+    "pipeline": ["pipelined_ard"],
+    "planner": ["select_dates", "plan_acquisitions"],
+    "points": ["wkb_point", "export_points"],
+    "prune": ["aoi_geometry", "prune_bursts"],
+    "resources": ["cpu_limit", "memory_limit", "get_workers", "check_computer_size"],
+    "scheduler": ["TrackScheduler"],
+    "storage": ["TempStorage", "tmp_storage"],
+    "tiles": ["export_tiles", "tiles_to_kmz"],
+    "trace": ["Tracer"],
+    "zonal": ["zonal_stats", "export_zonal_stats"],
+    "process": [
+        "create_dmp",
+        "get_project_dir",
+        "open_project",
+        "prepare_processing",
+        "clone_project",
+        "close_project",
+        "set_credentials",
+        "search_inventory",
+        "set_ard_parameters",
+        "process_track",
+        "ard_track",
+        "export_track",
+    ],
+}
+_modules = {name: module for module, names in _exports.items() for name in names}
+
+__all__ = ["report_startup", "warm_up", *_modules]
+
+
+def __getattr__(name):
+
+    if name not in _modules:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+    module = importlib.import_module(f".{_modules[name]}", __name__)
+    value = getattr(module, name)
+    globals()[name] = value
+
+    return value
+
+
+def __dir__():
+    return sorted({*globals(), *_modules})
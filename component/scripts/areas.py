@@ -0,0 +1,25 @@
+import numpy as np
+
+# radius of the authalic sphere in metres
+earth_radius = 6371007.2
+
+
+def pixel_areas(src, window):
+    """
+    Area in m² of the pixels of each row of a window of a raster.
+
+    The pixels of a geographic raster are areas of the authalic sphere between
+    their bounding meridians and parallels, the ones of a projected raster are
+    the product of their resolutions.
+    """
+
+    a, e, f = src.transform.a, src.transform.e, src.transform.f
+    rows = np.arange(window.row_off, window.row_off + window.height)
+
+    if not src.crs.is_geographic:
+        return np.full(rows.size, abs(a * e))
+
+    top = np.radians(f + e * rows)
+    bottom = np.radians(f + e * (rows + 1))
+
+    return earth_radius**2 * np.radians(abs(a)) * np.abs(np.sin(top) - np.sin(bottom))
@@ -0,0 +1,109 @@
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from component import parameter as pm
+
+cache_file = pm.cache_dir / "asf_availability.json"
+
+
+def _read_cache():
+    """read the identifiers known to be on ASF that are not expired"""
+
+    if not cache_file.is_file():
+        return {}
+
+    try:
+        cache = json.loads(cache_file.read_text())
+    except ValueError:
+        return {}
+
+    now = time.time()
+    return {k: v for k, v in cache.items() if now - v < pm.asf_cache_ttl}
+
+
+def _probe(session, identifier):
+    """
+    Get the status of a product on ASF without downloading it.
+
+    A request that fails (timeout, connection error...) is reported as 503 so that
+    the product is dropped and not cached without stopping the other checks.
+    """
+
+    try:
+        return _request_status(session, identifier)
+    except requests.RequestException:
+        return 503
+
+
+def _request_status(session, identifier):
+    """status of the HEAD request of a product, the earthdata login included"""
+
+    url = pm.asf_url.format(identifier)
+    response = session.head(url, allow_redirects=True, timeout=pm.asf_timeout)
+
+    # the first request ends on the earthdata login, authenticate there
+    # the login cookies are then shared by all the requests of the session
+    if response.status_code == 401:
+        response = session.head(
+            response.url, allow_redirects=True, timeout=pm.asf_timeout
+        )
+
+    # fallback to a single byte request if HEAD is not allowed
+    if response.status_code == 405:
+        with session.get(
+            url,
+            headers={"Range": "bytes=0-0"},
+            stream=True,
+            allow_redirects=True,
+            timeout=pm.asf_timeout,
+        ) as response:
+            pass
+
+    return 200 if response.status_code in [200, 206] else response.status_code
+
+
+def check_products_on_asf(identifiers, uname, pword, workers=pm.asf_workers):
+    """
+    Check the availability of several products on ASF at once.
+
+    The products are probed concurrently through a single pooled session and the
+    available ones are cached on disk for pm.asf_cache_ttl seconds so that they
+    are not checked again.
+
+    Return:
+        (dict): the status code of every identifier
+    """
+
+    cache = _read_cache()
+    status = {id_: 200 for id_ in identifiers if id_ in cache}
+    to_check = [id_ for id_ in dict.fromkeys(identifiers) if id_ not in status]
+
+    if to_check:
+        with requests.Session() as session:
+            session.auth = (uname, pword)
+            adapter = HTTPAdapter(pool_connections=workers, pool_maxsize=workers)
+            session.mount("https://", adapter)
+
+            # authenticate once before sending the concurrent requests
+            status[to_check[0]] = _probe(session, to_check[0])
+
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                probes = executor.map(lambda i: _probe(session, i), to_check[1:])
+                status.update(zip(to_check[1:], probes))
+
+        # save the available products
+        now = time.time()
+        cache.update({k: now for k in to_check if status[k] == 200})
+        cache_file.write_text(json.dumps(cache))
+
+    return status
+
+
+def check_product_on_asf(identifier, uname, pword):
+    """return the status code of a single product on ASF"""
+
+    return check_products_on_asf([identifier], uname, pword)[identifier]
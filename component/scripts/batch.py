@@ -0,0 +1,227 @@
+"""
+Headless batch processing of several events.
+
+Run the damage proxy maps of a list of (AOI, start, end) jobs in a single OST
+project: the inventories of the jobs are merged, each SLC is downloaded once and
+each acquisition is processed once for all the jobs that select it, the groups
+of dates of a track reuse the products of the previous ones through the product
+cache. The CCD and the outputs are then exported for every job in its own folder.
+
+usage: python -m component.scripts.batch jobs.json -o project_dir
+"""
+
+import argparse
+import csv
+import json
+from datetime import datetime as dt
+from datetime import timedelta
+from pathlib import Path
+
+import geopandas as gpd
+import pandas as pd
+
+from component import parameter as pm
+from component.scripts.manifest import Manifest
+from component.scripts.planner import plan_acquisitions
+from component.scripts.process import (
+    ard_track,
+    clone_project,
+    close_project,
+    export_track,
+    open_project,
+    prepare_processing,
+    search_inventory,
+)
+from component.scripts.resources import get_workers
+
+
+class ConsoleOutput:
+    """print the messages of the pipeline, stands for the Alert of the tile"""
+
+    def add_live_msg(self, msg, type_="info"):
+        print(f"[{type_}]{msg}", flush=True)
+
+    def append_msg(self, msg, section=False, type_="info"):
+        print(f"[{type_}]{msg}", flush=True)
+
+
+def read_jobs(file):
+    """
+    Read the jobs of a JSON or CSV file.
+
+    Each job has an "aoi" vector file, an event "start" and "end" (YYYY-MM-DD), an
+    optional "name" and an optional "zones" vector file for the damage statistics,
+    relative paths are read from the jobs file folder.
+    """
+
+    file = Path(file)
+    if file.suffix == ".csv":
+        with file.open() as f:
+            jobs = list(csv.DictReader(f))
+    else:
+        jobs = json.loads(file.read_text())
+
+    for job in jobs:
+        job["aoi"] = file.parent / job["aoi"]
+        job["zones"] = file.parent / job["zones"] if job.get("zones") else None
+        job["end"] = job.get("end") or job["start"]
+        job["name"] = job.get("name") or f"{Path(job['aoi']).stem}_{job['start']}"
+        job["gdf"] = gpd.read_file(job["aoi"]).to_crs("EPSG:4326")
+
+    return jobs
+
+
+def run_batch(
+    jobs, project_dir, output=None, username=None, password=None, dry_run=False
+):
+    """
+    Create the damage proxy maps of all the jobs in a shared OST project.
+
+    The tracks that have the same dates selected for several jobs are downloaded
+    and processed once in their own processing folder, their CCD are exported over
+    the AOI of each job in project_dir/<job name>/Damage_Proxy_Maps. Return the
+    acquisition plan of every job, raise once all the groups are done if some of
+    them failed so that the command exits with an error.
+    """
+
+    output = output or ConsoleOutput()
+    project_dir = Path(project_dir)
+
+    # search around all the events in the union of the aois
+    for job in jobs:
+        job["event_start"] = dt.strptime(job["start"], "%Y-%m-%d")
+        job["event_end"] = dt.strptime(job["end"], "%Y-%m-%d")
+        job["wkt"] = job["gdf"].dissolve().geometry.to_wkt().values[0]
+
+    search_start = min(job["event_start"] for job in jobs) + timedelta(days=-60)
+    search_end = max(job["event_end"] for job in jobs) + timedelta(days=30)
+    search_start = dt.strftime(search_start, "%Y-%m-%d")
+    search_end = dt.strftime(search_end, "%Y-%m-%d")
+    aois = pd.concat([job["gdf"] for job in jobs], ignore_index=True)
+    aoi = aois.dissolve().geometry.to_wkt().values[0]
+
+    s1_slc, manifest = open_project(
+        project_dir, aoi, search_start, search_end, output, username, password
+    )
+    tracer = manifest.tracer
+    search_inventory(s1_slc, search_start, search_end, manifest, output)
+
+    # group the jobs that use the same acquisitions of a track
+    plans, groups = {}, {}
+    for job in jobs:
+        plan = plan_acquisitions(
+            s1_slc.inventory,
+            job["wkt"],
+            job["event_start"],
+            job["event_end"],
+            get_workers(),
+        )
+        plans[job["name"]] = plan
+        for track, row in plan.iterrows():
+            if row.message:
+                output.append_msg(f" {job['name']}: {row.message} for track {track}")
+                continue
+            groups.setdefault((track, tuple(row.dates)), []).append(job)
+
+    for (track, dates), group_jobs in groups.items():
+        names = ", ".join(job["name"] for job in group_jobs)
+        output.append_msg(f" Track {track} {dates[0]}-{dates[-1]}: {names}")
+
+    if dry_run:
+        return plans
+
+    scheduler = prepare_processing(s1_slc, project_dir, manifest, output)
+
+    # the outputs of each job are recorded in their own folder
+    manifests = {
+        job["name"]: Manifest(project_dir / job["name"], tracer) for job in jobs
+    }
+
+    def run_group(group):
+        track, dates = group
+        key = f"{track}_{dates[0]}_{dates[-1]}"
+
+        # the timescan of each group of dates is computed in its own folder
+        group_slc = clone_project(s1_slc, Path(s1_slc.processing_dir) / key)
+
+        # the downloads are shared between the groups and removed at the end
+        ccd_files = ard_track(
+            group_slc,
+            track,
+            list(dates),
+            output,
+            scheduler,
+            manifest,
+            key=key,
+            keep_downloads=True,
+        )
+
+        for job in groups[group]:
+            dpm_out_dir = project_dir / job["name"] / "Damage_Proxy_Maps"
+            export_track(
+                ccd_files,
+                track,
+                job["gdf"],
+                dpm_out_dir,
+                output,
+                scheduler,
+                manifests[job["name"]],
+                zones_file=job["zones"],
+            )
+
+        return
+
+    # the groups of a track run one after the other: its scenes are downloaded by
+    # the first one and the acquisitions they share are restored from the product
+    # cache by the next ones instead of being processed again
+    track_groups = {}
+    for group in sorted(groups):
+        track_groups.setdefault(group[0], []).append(group)
+
+    errors = {}
+
+    def run_track(track):
+        for group in track_groups[track]:
+            try:
+                run_group(group)
+            except Exception as e:
+                errors[group] = str(e)
+
+    scheduler.run(list(track_groups), run_track)
+    for (track, dates), error in errors.items():
+        output.add_live_msg(
+            f" Processing failed for track {track} {dates[0]}-{dates[-1]}: {error}",
+            "warning",
+        )
+
+    # keep the downloads of the failed groups so that they can be resumed
+    failed = [f"track {t} {d[0]}-{d[-1]}" for t, d in errors]
+    close_project(s1_slc, manifest, project_dir / "trace.json", failed, output)
+
+    return plans
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("jobs", help="JSON or CSV file of the jobs")
+    parser.add_argument(
+        "-o",
+        "--output",
+        default=pm.result_dir / f"batch_{dt.now():%Y-%m-%d}",
+        help="folder of the shared project",
+    )
+    parser.add_argument("-u", "--username", help="scihub username")
+    parser.add_argument("-p", "--password", help="scihub password")
+    parser.add_argument(
+        "--dry-run", action="store_true", help="only plan the acquisitions"
+    )
+    args = parser.parse_args()
+
+    run_batch(
+        read_jobs(args.jobs),
+        args.output,
+        username=args.username,
+        password=args.password,
+        dry_run=args.dry_run,
+    )
@@ -0,0 +1,226 @@
+"""
+Offline benchmark of the post-ARD raster pipeline.
+
+Synthetic coherence bursts are generated in a temporary OST like processing dir
+and every post-processing stage is run in its own process to record its wall time,
+CPU time and peak memory. The results are written to a JSON file to be compared
+between commits::
+
+    python -m component.scripts.benchmark --bursts 8 --size 4096 -o benchmark.json
+"""
+
+import argparse
+import json
+import multiprocessing as mp
+import platform
+import resource
+import subprocess
+import tempfile
+import time
+from datetime import datetime as dt
+from pathlib import Path
+
+import geopandas as gpd
+import numpy as np
+import rasterio as rio
+from rasterio.transform import from_origin
+from shapely.geometry import box
+
+from component import parameter as pm
+from component.scripts.ccd import ccd_bursts
+from component.scripts.clusters import export_clusters
+from component.scripts.colour import colour_dpm
+from component.scripts.export import export_kmz, to_cog
+from component.scripts.mosaic import mosaic_to_aoi
+from component.scripts.points import export_points
+from component.scripts.resources import cpu_limit, get_workers
+from component.scripts.tiles import export_tiles, tiles_to_kmz
+from component.scripts.zonal import export_zonal_stats
+
+# 30 m in degrees as produced by OST
+res = 0.00027
+
+
+def make_dataset(root, bursts=8, size=2048, seed=0):
+    """
+    Create synthetic coherence min/max bursts, an AOI and zones in root.
+
+    The bursts are laid out in 2 rows overlapping by 10% like the bursts of a
+    track, the AOI covers the center of the mosaic and is split in a 20x20 grid of
+    zones.
+    """
+
+    rng = np.random.default_rng(seed)
+    step = int(size * 0.9)
+
+    for i in range(bursts):
+        burst = root / "processing" / f"A7_IW1_{i:04d}" / "Timescan"
+        burst.mkdir(parents=True, exist_ok=True)
+
+        col, row = i // 2, i % 2
+        meta = {
+            "driver": "GTiff",
+            "dtype": "float32",
+            "count": 1,
+            "width": size,
+            "height": size,
+            "crs": "EPSG:4326",
+            "transform": from_origin(col * step * res, -row * step * res, res, res),
+            "tiled": True,
+            "blockxsize": 256,
+            "blockysize": 256,
+        }
+
+        # coherence of the pre-event stack and a damaged post-event one
+        pre = rng.uniform(0.3, 1, (size, size)).astype("float32")
+        post = pre * rng.uniform(0.2, 1, (size, size)).astype("float32")
+
+        with rio.open(burst / "02.coh.VV.max.tif", "w", **meta) as dst:
+            dst.write(pre, 1)
+        with rio.open(burst / "01.coh.VV.min.tif", "w", **meta) as dst:
+            dst.write(post, 1)
+
+    # aoi in the middle of the mosaic
+    width = (bursts + 1) // 2 * step * res
+    height = 2 * step * res
+    aoi = box(width * 0.1, -height * 0.8, width * 0.9, -height * 0.1)
+    gpd.GeoDataFrame(geometry=[aoi], crs="EPSG:4326").to_file(root / "aoi.gpkg")
+
+    # grid of zones over the aoi
+    minx, miny, maxx, maxy = aoi.bounds
+    xs, ys = np.linspace(minx, maxx, 21), np.linspace(miny, maxy, 21)
+    zones = [
+        box(x0, y0, x1, y1) for x0, x1 in zip(xs, xs[1:]) for y0, y1 in zip(ys, ys[1:])
+    ]
+    gpd.GeoDataFrame(geometry=zones, crs="EPSG:4326").to_file(root / "zones.gpkg")
+
+    return root
+
+
+def _bursts(root):
+    return sorted((root / "processing").glob("A*"))
+
+
+def _ccd_files(root):
+    return sorted((root / "processing").glob("A*/Timescan/ccd*.tif"))
+
+
+# the stages of the pipeline, in order, they only depend on the previous ones
+stages = {
+    "ccd": lambda root: ccd_bursts(_bursts(root), get_workers()),
+    "mosaic": lambda root: mosaic_to_aoi(_ccd_files(root), root / "mosaic.tif"),
+    "crop": lambda root: mosaic_to_aoi(
+        _ccd_files(root), root / "ccd.tif", gpd.read_file(root / "aoi.gpkg")
+    ),
+    "colour": lambda root: colour_dpm(root / "ccd.tif", root / "dpm.tif"),
+    "crop_colour": lambda root: mosaic_to_aoi(
+        _ccd_files(root),
+        root / "ccd_fused.tif",
+        gpd.read_file(root / "aoi.gpkg"),
+        dpm_file=root / "dpm_fused.tif",
+    ),
+    "cog": lambda root: [to_cog(root / "ccd.tif"), to_cog(root / "dpm.tif")],
+    "tiles": lambda root: export_tiles(
+        root / "dpm.tif", root / "dpm.mbtiles", cpu_limit()
+    ),
+    "kmz_tiles": lambda root: tiles_to_kmz(root / "dpm.mbtiles", root / "tiles.kmz"),
+    "kmz": lambda root: export_kmz(root / "dpm.tif", root / "dpm.kmz"),
+    "points": lambda root: export_points(root / "ccd.tif", root / "dpm.parquet"),
+    "clusters": lambda root: export_clusters(
+        root / "ccd.tif", root / "clusters.parquet"
+    ),
+    "zonal": lambda root: export_zonal_stats(
+        root / "ccd.tif", gpd.read_file(root / "zones.gpkg"), root / "zonal.csv"
+    ),
+}
+
+
+def _run_stage(name, root, queue):
+    """run a stage and send its measures back to the parent process"""
+
+    start = time.perf_counter()
+    try:
+        stages[name](root)
+    except Exception as e:
+        queue.put({"stage": name, "error": str(e)})
+        return
+    wall = time.perf_counter() - start
+
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    children = resource.getrusage(resource.RUSAGE_CHILDREN)
+
+    queue.put(
+        {
+            "stage": name,
+            "wall_s": round(wall, 3),
+            "cpu_s": round(
+                usage.ru_utime + usage.ru_stime + children.ru_utime + children.ru_stime,
+                3,
+            ),
+            # ru_maxrss is in kB on Linux
+            "peak_rss_mb": round(max(usage.ru_maxrss, children.ru_maxrss) / 1024, 1),
+        }
+    )
+
+
+def _commit():
+    """the current git commit if any"""
+
+    try:
+        cmd = ["git", "rev-parse", "--short", "HEAD"]
+        return subprocess.check_output(
+            cmd, text=True, stderr=subprocess.DEVNULL
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_benchmark(bursts=8, size=2048, output="benchmark.json"):
+    """generate the dataset, run every stage in a fresh process and save the results"""
+
+    ctx = mp.get_context("fork")
+    results = []
+
+    with tempfile.TemporaryDirectory() as tmp:
+        root = make_dataset(Path(tmp), bursts, size)
+
+        for name in stages:
+            queue = ctx.Queue()
+            process = ctx.Process(target=_run_stage, args=(name, root, queue))
+            process.start()
+            result = queue.get()
+            process.join()
+            results.append(result)
+
+            if "error" in result:
+                print(f"{name:>8}: failed ({result['error']})")
+                continue
+
+            print(
+                f"{name:>8}: {result['wall_s']:>8.2f} s wall, "
+                f"{result['cpu_s']:>8.2f} s cpu, {result['peak_rss_mb']:>8.1f} MB"
+            )
+
+    report = {
+        "date": dt.now().isoformat(timespec="seconds"),
+        "commit": _commit(),
+        "machine": platform.platform(),
+        "bursts": bursts,
+        "size": size,
+        "block_size": pm.block_size,
+        "stages": results,
+    }
+    Path(output).write_text(json.dumps(report, indent=2))
+
+    return report
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--bursts", type=int, default=8, help="number of bursts")
+    parser.add_argument("--size", type=int, default=2048, help="burst size in pixels")
+    parser.add_argument("-o", "--output", default="benchmark.json")
+    args = parser.parse_args()
+
+    run_benchmark(args.bursts, args.size, args.output)
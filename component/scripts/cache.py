@@ -0,0 +1,201 @@
+import json
+import os
+import shutil
+import threading
+import time
+from pathlib import Path
+
+from ost import Sentinel1Scene
+
+from component import parameter as pm
+
+from .manifest import hash_params
+
+
+def _link(src, dst):
+    """hard link a file, copy it if the link is not possible"""
+
+    dst.parent.mkdir(parents=True, exist_ok=True)
+    if dst.exists():
+        return dst
+
+    try:
+        os.link(src, dst)
+    except OSError:
+        tmp = dst.with_name(f"{dst.name}.part")
+        shutil.copy2(src, tmp)
+        tmp.replace(dst)
+
+    return dst
+
+
+def _size(path):
+    """size of a file or of all the files of a directory"""
+
+    if path.is_file():
+        return path.stat().st_size
+
+    return sum(f.stat().st_size for f in path.rglob("*") if f.is_file())
+
+
+class ProductCache:
+    """
+    Cache of the SLC downloads and of the burst ARD products shared by all the projects.
+
+    The SLC are stored by identifier and the single date ARD of a burst by burst
+    id, acquisition date, coherence partner date and ARD parameters, so that the
+    acquisitions shared by events of the same track are only downloaded and
+    processed once. The products are hard linked between the cache and the
+    projects, the least recently used ones are evicted above the disk quota.
+    """
+
+    def __init__(self, root=pm.cache_dir / "products", quota=pm.cache_quota):
+
+        self.root = Path(root)
+        self.quota = quota * 1024**3
+        self.index_file = self.root / "index.json"
+        self._lock = threading.Lock()
+
+        self.root.mkdir(parents=True, exist_ok=True)
+
+    def _touch(self, entries):
+        """record the last use of the cache entries"""
+
+        if not entries:
+            return
+
+        with self._lock:
+            index = self._read_index()
+            index.update({str(e.relative_to(self.root)): time.time() for e in entries})
+            self.index_file.write_text(json.dumps(index))
+
+    def _read_index(self):
+
+        if not self.index_file.is_file():
+            return {}
+
+        return json.loads(self.index_file.read_text())
+
+    def _slc_entry(self, identifier):
+        return self.root / "slc" / f"{identifier}.zip"
+
+    def _ard_entry(self, bid, date, partner, params):
+        return self.root / "ard" / f"{bid}_{date}_{partner}_{hash_params(params)[:12]}"
+
+    def restore_slcs(self, identifiers, download_dir):
+        """link the cached SLC in the download dir and return the missing identifiers"""
+
+        hits, missing = [], []
+        for identifier in identifiers:
+            entry = self._slc_entry(identifier)
+            if not entry.is_file():
+                missing.append(identifier)
+                continue
+
+            file = Sentinel1Scene(identifier).download_path(download_dir, mkdir=True)
+            _link(entry, file)
+            file.with_suffix(".downloaded").write_text("successfully downloaded \n")
+            hits.append(entry)
+
+        self._touch(hits)
+
+        return missing
+
+    def store_slcs(self, identifiers, download_dir):
+        """add the downloaded SLC to the cache"""
+
+        entries = []
+        for identifier in identifiers:
+            for file in Path(download_dir).glob(f"**/{identifier}.zip"):
+                entries.append(_link(file, self._slc_entry(identifier)))
+
+        self._touch(entries)
+
+        return
+
+    def _partners(self, dates):
+        """the date each acquisition computes its coherence with"""
+
+        dates = sorted(dates)
+        return dict(zip(dates, dates[1:] + ["last"]))
+
+    def restore_ards(self, bids, dates, params, processing_dir):
+        """link the cached single date ARD of the bursts in the processing dir"""
+
+        hits = []
+        for bid in bids:
+            for date, partner in self._partners(dates).items():
+                entry = self._ard_entry(bid, date, partner, params)
+                if not entry.is_dir():
+                    continue
+
+                for file in entry.rglob("*"):
+                    if file.is_file():
+                        dst = processing_dir / bid / date / file.relative_to(entry)
+                        _link(file, dst)
+                hits.append(entry)
+
+        self._touch(hits)
+
+        return len(hits)
+
+    def store_ards(self, bursts, dates, params):
+        """add the processed single date ARD of the bursts to the cache"""
+
+        entries = []
+        for burst in bursts:
+            for date, partner in self._partners(dates).items():
+                date_dir = burst / date
+
+                # only the completely processed acquisitions are cached
+                if not any(date_dir.glob("*processed")):
+                    continue
+
+                entry = self._ard_entry(burst.name, date, partner, params)
+                if not entry.is_dir():
+                    tmp = entry.with_name(f"{entry.name}.part")
+                    shutil.rmtree(tmp, ignore_errors=True)
+                    for file in date_dir.rglob("*"):
+                        if file.is_file():
+                            _link(file, tmp / file.relative_to(date_dir))
+                    tmp.replace(entry)
+                entries.append(entry)
+
+        self._touch(entries)
+
+        return
+
+    def evict(self):
+        """remove the least recently used products until the cache fits in the quota"""
+
+        with self._lock:
+            index = self._read_index()
+
+            # the products being written are not evicted
+            entries = [*self.root.glob("slc/*.zip"), *self.root.glob("ard/*")]
+            entries = [e for e in entries if not e.name.endswith(".part")]
+            entries = {str(e.relative_to(self.root)): e for e in entries}
+            sizes = {key: _size(entry) for key, entry in entries.items()}
+
+            total = sum(sizes.values())
+            for key in sorted(entries, key=lambda k: index.get(k, 0)):
+                if total <= self.quota:
+                    break
+
+                entry = entries[key]
+                if entry.is_dir():
+                    shutil.rmtree(entry, ignore_errors=True)
+                else:
+                    entry.unlink(missing_ok=True)
+                total -= sizes[key]
+
+            index = {
+                key: used for key, used in index.items() if (self.root / key).exists()
+            }
+            self.index_file.write_text(json.dumps(index))
+
+        return total
+
+
+# the cache of all the projects run in this kernel
+product_cache = ProductCache()
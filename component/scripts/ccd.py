@@ -0,0 +1,127 @@
+import math
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+import rasterio as rio
+import shapely
+from rasterio.windows import Window, from_bounds, intersect
+from shapely.geometry import box
+
+from component import parameter as pm
+
+
+def _aoi_window(src, aoi):
+    """window of the raster covering the AOI bounds, the full raster if they don't intersect"""
+
+    window = from_bounds(*aoi.bounds, transform=src.transform)
+    col_off = max(0, math.floor(window.col_off))
+    row_off = max(0, math.floor(window.row_off))
+    col_end = min(src.width, math.ceil(window.col_off + window.width))
+    row_end = min(src.height, math.ceil(window.row_off + window.height))
+
+    if col_end <= col_off or row_end <= row_off:
+        return Window(0, 0, src.width, src.height)
+
+    return Window(col_off, row_off, col_end - col_off, row_end - row_off)
+
+
+def compute_ccd(coh_min, coh_max, dstnt_file, threshold=None, aoi=None):
+    """
+    Compute the coherent change of a burst block by block.
+
+    The pre-event (max) and post-event (min) coherence are read window by window
+    as float32, the difference is thresholded and quantized to uint8 in place and
+    every block is written as soon as it is computed so that the memory footprint
+    doesn't depend on the burst size. If an AOI geometry is provided (in the CRS of
+    the rasters) the output only covers its window of the burst and the blocks
+    that don't intersect it are left to nodata. The threshold defaults to
+    pm.ccd_threshold.
+    """
+
+    threshold = pm.ccd_threshold if threshold is None else threshold
+
+    with rio.open(coh_max) as pre_coh, rio.open(coh_min) as post_coh:
+
+        aoi_window = Window(0, 0, pre_coh.width, pre_coh.height)
+        if aoi is not None:
+            aoi_window = _aoi_window(pre_coh, aoi)
+            shapely.prepare(aoi)
+
+        # get metadata for destination file
+        meta = pre_coh.meta.copy()
+        meta.update(
+            dtype="uint8",
+            nodata=0,
+            width=aoi_window.width,
+            height=aoi_window.height,
+            transform=pre_coh.window_transform(aoi_window),
+        )
+
+        with rio.open(dstnt_file, "w", **meta) as dstnt:
+            for _, window in pre_coh.block_windows(1):
+
+                # only the pixels of the aoi are computed
+                if not intersect(window, aoi_window):
+                    continue
+                window = window.intersection(aoi_window)
+                if aoi is not None:
+                    if not aoi.intersects(box(*pre_coh.window_bounds(window))):
+                        continue
+
+                coh_diff = pre_coh.read(window=window, out_dtype="float32")
+                post_arr = post_coh.read(window=window, out_dtype="float32")
+
+                # calculate difference, nan and values below threshold are set to 0
+                np.subtract(coh_diff, post_arr, out=coh_diff)
+                coh_diff[~(coh_diff >= threshold)] = 0
+                np.multiply(coh_diff, 100, out=coh_diff)
+
+                out_window = Window(
+                    window.col_off - aoi_window.col_off,
+                    window.row_off - aoi_window.row_off,
+                    window.width,
+                    window.height,
+                )
+                dstnt.write(coh_diff.astype("uint8"), window=out_window)
+
+    return dstnt_file
+
+
+def _burst_ccd(burst, aoi=None, threshold=None):
+    """compute the coherent change of a single OST burst directory"""
+
+    # in and out files
+    coh_min = burst.joinpath("Timescan/01.coh.VV.min.tif")
+    coh_max = burst.joinpath("Timescan/02.coh.VV.max.tif")
+    dstnt_file = burst.joinpath(f"Timescan/ccd_{burst.name}.tif")
+
+    return compute_ccd(coh_min, coh_max, dstnt_file, threshold, aoi)
+
+
+def ccd_bursts(bursts, workers, aoi=None, threshold=None):
+    """
+    Compute the coherent change of all the bursts in a pool of processes.
+
+    The bursts are restricted to the AOI geometry if provided. The threshold is
+    read from the parameters before the pool is started so that the processes
+    don't depend on the state of their own copy of the module.
+
+    A failing burst doesn't stop the others, the errors are collected and returned
+    as a dict of {burst name: error message}.
+    """
+
+    threshold = pm.ccd_threshold if threshold is None else threshold
+
+    errors = {}
+    with ProcessPoolExecutor(max_workers=max(1, workers)) as executor:
+        futures = {
+            executor.submit(_burst_ccd, burst, aoi, threshold): burst
+            for burst in bursts
+        }
+        for future in as_completed(futures):
+            try:
+                future.result()
+            except Exception as e:
+                errors[futures[future].name] = str(e)
+
+    return errors
@@ -0,0 +1,208 @@
+import json
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+import rasterio as rio
+from rasterio.windows import Window
+from scipy import ndimage, sparse
+from scipy.sparse.csgraph import connected_components
+
+from component import parameter as pm
+
+from .areas import pixel_areas
+from .points import _geo_schema, _to_wkb
+
+
+def _strips(src):
+    """full width windows of block_size rows"""
+
+    for row_off in range(0, src.height, pm.block_size):
+        yield Window(0, row_off, src.width, min(pm.block_size, src.height - row_off))
+
+
+def _edge_pairs(above, below):
+    """pairs of labels touching across the edge of two strips (8-connectivity)"""
+
+    pairs = []
+    n = above.size
+    for shift in [-1, 0, 1]:
+        a = above[max(0, -shift) : n - max(0, shift)]
+        b = below[max(0, shift) : n - max(0, -shift)]
+        touch = (a > 0) & (b > 0)
+        pairs.append(np.stack([a[touch], b[touch]], axis=1))
+
+    return np.concatenate(pairs)
+
+
+def _label_strips(src):
+    """
+    Label the damaged pixels strip by strip and gather the statistics of each label.
+
+    The labels are numbered across the strips, the pairs of labels that touch at
+    the edge of two strips are returned to be merged.
+    """
+
+    a, b, c, d, e, f = src.transform[:6]
+    structure = np.ones((3, 3), dtype=bool)
+
+    # the empty arrays stand for a raster without damaged pixels
+    n_labels, last_row = 0, None
+    stats = {k: [np.zeros(0)] for k in ["pixels", "area", "sum", "x", "y"]}
+    stats["max"] = [np.zeros(0, dtype=src.dtypes[0])]
+    hist, edges = [np.zeros((0, 3), dtype="int64")], [np.zeros((0, 2), dtype="int32")]
+
+    for window in _strips(src):
+        arr = src.read(1, window=window)
+        labels, n = ndimage.label(arr > 0, structure=structure)
+        labels[labels > 0] += n_labels
+
+        if last_row is not None:
+            edges.append(_edge_pairs(last_row, labels[0]))
+        last_row = labels[-1].copy()
+
+        if n == 0:
+            continue
+
+        # vectorized reductions over the pixels of the strip
+        rows, cols = np.nonzero(labels)
+        idx = labels[rows, cols] - n_labels - 1
+        vals = arr[rows, cols]
+        xs = a * (cols + 0.5) + b * (rows + window.row_off + 0.5) + c
+        ys = d * (cols + 0.5) + e * (rows + window.row_off + 0.5) + f
+
+        stats["pixels"].append(np.bincount(idx, minlength=n))
+        stats["area"].append(
+            np.bincount(idx, weights=pixel_areas(src, window)[rows], minlength=n)
+        )
+        stats["sum"].append(np.bincount(idx, weights=vals, minlength=n))
+        stats["x"].append(np.bincount(idx, weights=xs, minlength=n))
+        stats["y"].append(np.bincount(idx, weights=ys, minlength=n))
+        max_vals = np.zeros(n, dtype=arr.dtype)
+        np.maximum.at(max_vals, idx, vals)
+        stats["max"].append(max_vals)
+
+        # sparse histogram of the CCD values of each label
+        keys, counts = np.unique(idx.astype("int64") * 256 + vals, return_counts=True)
+        hist.append(np.stack([keys // 256 + n_labels, keys % 256, counts], axis=1))
+
+        n_labels += n
+
+    stats = {k: np.concatenate(v) for k, v in stats.items()}
+
+    return n_labels, stats, np.concatenate(hist), np.concatenate(edges)
+
+
+def _percentile(hist, q):
+    """nearest rank percentile of each row of a sparse histogram"""
+
+    hist.sort_indices()
+    cum = np.cumsum(hist.data)
+    totals = np.asarray(hist.sum(axis=1)).ravel()
+
+    # the counts of the previous rows are added to the rank of each row
+    base = cum[hist.indptr[1:] - 1] - totals
+    ranks = np.maximum(1, np.ceil(q / 100 * totals)).astype("int64")
+
+    return hist.indices[np.searchsorted(cum, base + ranks)].astype("uint8")
+
+
+def damage_clusters(ccd_file):
+    """
+    Find the clusters of connected damaged pixels (8-connectivity) of a CCD raster.
+
+    The raster is labelled by strips of block_size rows with scipy, the labels
+    that touch across two strips are merged as the connected components of their
+    graph. Return a dict of arrays with the pixel count, area (m²), mean, max and
+    percentile CCD and the centroid of each cluster of at least
+    cluster_min_pixels pixels.
+    """
+
+    with rio.open(ccd_file) as src:
+        n_labels, stats, hist, edges = _label_strips(src)
+
+    # merge the labels split by the strip edges
+    graph = sparse.coo_matrix(
+        (np.ones(len(edges)), (edges[:, 0] - 1, edges[:, 1] - 1)),
+        shape=(n_labels, n_labels),
+    )
+    n_clusters, clusters = connected_components(graph, directed=False)
+
+    pixels = np.bincount(clusters, weights=stats["pixels"], minlength=n_clusters)
+    max_vals = np.zeros(n_clusters, dtype="uint8")
+    np.maximum.at(max_vals, clusters, stats["max"])
+    cluster_hist = sparse.coo_matrix(
+        (hist[:, 2], (clusters[hist[:, 0]], hist[:, 1])), shape=(n_clusters, 256)
+    ).tocsr()
+
+    def total(name):
+        totals = np.bincount(clusters, weights=stats[name], minlength=n_clusters)
+        return totals.astype("float64")
+
+    result = {
+        "pixels": pixels.astype("uint32"),
+        "area_m2": total("area"),
+        "ccd_mean": (total("sum") / np.maximum(pixels, 1)).astype("float32"),
+        "ccd_max": max_vals,
+        f"ccd_p{pm.cluster_percentile}": _percentile(
+            cluster_hist, pm.cluster_percentile
+        ),
+        "x": total("x") / np.maximum(pixels, 1),
+        "y": total("y") / np.maximum(pixels, 1),
+    }
+
+    # the clusters are numbered once the smallest ones are dropped
+    keep = pixels >= pm.cluster_min_pixels
+    cluster = np.arange(keep.sum(), dtype="uint32")
+
+    return {"cluster": cluster, **{k: v[keep] for k, v in result.items()}}
+
+
+def _write_parquet(clusters, crs, dstnt_file):
+    """write the cluster centroids to a GeoParquet file"""
+
+    columns = {k: pa.array(v) for k, v in clusters.items() if k not in ["x", "y"]}
+    schema = _geo_schema(crs, [(k, v.type) for k, v in columns.items()])
+    geometry = _to_wkb(clusters["x"], clusters["y"])
+    table = pa.Table.from_arrays([*columns.values(), geometry], schema=schema)
+
+    pq.write_table(table, dstnt_file, compression="zstd")
+
+
+def _write_geojson(clusters, crs, dstnt_file):
+    """write the cluster centroids to a GeoJSON file"""
+
+    names = [k for k in clusters if k not in ["x", "y"]]
+    features = [
+        {
+            "type": "Feature",
+            "properties": dict(zip(names, values)),
+            "geometry": {"type": "Point", "coordinates": [x, y]},
+        }
+        for *values, x, y in zip(
+            *[clusters[k].tolist() for k in names],
+            clusters["x"].tolist(),
+            clusters["y"].tolist(),
+        )
+    ]
+
+    with open(dstnt_file, "w") as f:
+        json.dump({"type": "FeatureCollection", "features": features}, f)
+
+
+def export_clusters(ccd_file, dstnt_file):
+    """
+    Export the damage clusters of a CCD raster as one centroid per cluster.
+
+    The format is given by the suffix of the destination file: ".parquet"
+    (GeoParquet) or ".geojson".
+    """
+
+    writers = {".parquet": _write_parquet, ".geojson": _write_geojson}
+
+    with rio.open(ccd_file) as src:
+        crs = src.crs
+
+    writers[dstnt_file.suffix](damage_clusters(ccd_file), crs, dstnt_file)
+
+    return dstnt_file
@@ -0,0 +1,65 @@
+import numpy as np
+import rasterio as rio
+from rasterio.enums import ColorInterp
+
+from component import parameter as pm
+
+
+def colour_lut(breakpoints=None, ramp=None):
+    """
+    Build the 256 entries RGBA lookup table of the uint8 CCD values.
+
+    The colours are interpolated between the breakpoints and clamped outside of
+    them as done by the gdal color-relief, the nodata value (0) is transparent.
+    They default to pm.colour_breakpoints and pm.colour_ramp.
+    """
+
+    breakpoints = pm.colour_breakpoints if breakpoints is None else breakpoints
+    ramp = pm.colour_ramp if ramp is None else ramp
+
+    values = np.arange(256)
+    ramp = np.array(ramp, dtype="float64")
+    lut = np.stack(
+        [np.interp(values, breakpoints, ramp[:, i]) for i in range(4)], axis=-1
+    )
+
+    # same rounding as gdal
+    lut = np.floor(lut + 0.45).clip(0, 255).astype("uint8")
+    lut[0] = 0
+
+    return lut
+
+
+def open_dpm(dpm_file, ccd_profile):
+    """open the RGBA damage proxy map for writing along a CCD raster"""
+
+    profile = ccd_profile.copy()
+    profile.update(count=4, dtype="uint8", nodata=None, photometric="RGB")
+
+    dst = rio.open(dpm_file, "w", **profile)
+    dst.colorinterp = [
+        ColorInterp.red,
+        ColorInterp.green,
+        ColorInterp.blue,
+        ColorInterp.alpha,
+    ]
+
+    return dst
+
+
+def write_dpm(dst, ccd, window, lut):
+    """colour a CCD block with the lookup table and write it in the DPM"""
+
+    dst.write(np.moveaxis(lut[ccd], -1, 0), window=window)
+
+
+def colour_dpm(ccd_file, dpm_file):
+    """colour the CCD raster into the RGBA damage proxy map"""
+
+    lut = colour_lut()
+
+    with rio.open(ccd_file) as src, open_dpm(dpm_file, src.profile) as dst:
+        for _, window in src.block_windows(1):
+            write_dpm(dst, src.read(1, window=window), window, lut)
+
+    return dpm_file
@@ -0,0 +1,71 @@
+from osgeo import gdal
+
+from component import parameter as pm
+
+
+def to_cog(file):
+    """
+    Rewrite a GeoTIFF as a Cloud Optimized GeoTIFF.
+
+    The COG has internal overviews and the block size of the other outputs, it is
+    compressed with a predictor on all the CPUs.
+    """
+
+    tmp_file = file.with_suffix(".cog.tif")
+    opts = gdal.TranslateOptions(format="COG", creationOptions=pm.cog_options)
+    gdal.Translate(str(tmp_file), str(file), options=opts)
+    tmp_file.replace(file)
+
+    return file
+
+
+def export_kmz(dpm_file, kmz_file):
+    """export the damage proxy map as a KML super overlay"""
+
+    opts = gdal.TranslateOptions(
+        format="KMLSUPEROVERLAY", creationOptions=["format=png"]
+    )
+    gdal.Translate(str(kmz_file), str(dpm_file), options=opts)
+
+    ### adding legend like this to KMZ
+    # added = [
+    #    "\t\t<ScreenOverlay>\n",
+    #    "\t\t\t<name>\n",
+    #    "Legend: Damage Proxy Map\n",
+    #    "\t\t\t</name>\n",
+    #    "\t\t\t<Icon>\n",
+    #    "\t\t\t\t<href>https://raw.githubusercontent.com/12rambau/damage_proxy_map/refactoring/component/message/legend.png</href>\n",
+    #    "\t\t\t</Icon>\n",
+    #    '\t\t\t<overlayXY x="0.98" y="0.14" xunits="fraction" yunits="fraction"/>\n',
+    #    '\t\t\t<screenXY x="0.98" y="0.14" xunits="fraction" yunits="fraction"/>\n',
+    #    '\t\t\t<rotationXY x="0.5" y="0.5" xunits="fraction" yunits="fraction"/>\n',
+    #    '\t\t\t<size x="0.1" y="0.18" xunits="fraction" yunits="fraction"/>\n',
+    #    "\t\t</ScreenOverlay>\n",
+    #    "\t</Document>\n",
+    #    "</kml>\n"
+    # ]
+    # tmpzip = tmp_dir.joinpath('zipped')
+    # tmpzip.mkdir(parents=True, exist_ok=True)
+    #
+    # with ZipFile(out_dmp_tif.with_suffix('.kmz')) as zip_ref:
+    #    zip_ref.extractall(tmpzip)
+    #    with open(tmpzip.joinpath('doc.kml')) as f:
+    #
+    #        lines = f.readlines()
+    #        lines = lines[:-2]
+    #        lines.extend(added)
+    #
+    #    with open(tmpzip.joinpath('doc.kml'), 'w') as f:
+    #        for ele in lines:
+    #            f.write(ele)
+    #
+    # with ZipFile(out_dmp_tif.with_suffix('.kmz'), 'w') as zip_ref:
+    #    # Iterate over all the files in directory
+    #    for folderName, subfolders, filenames in os.walk(tmpzip):
+    #        for filename in filenames:
+    #           #create complete filepath of file in directory
+    #           filePath = os.path.join(folderName, filename)
+    #           # Add file to zip
+    #           zip_ref.write(filePath, os.path.join('/0/0/', os.path.basename(filePath)))
+    #
+    return kmz_file
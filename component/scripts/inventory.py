@@ -0,0 +1,117 @@
+import hashlib
+import json
+from datetime import date, datetime as dt, timedelta
+
+import pandas as pd
+import shapely
+from shapely import wkt
+
+from component import parameter as pm
+
+
+def aoi_key(aoi):
+    """hash of the normalized AOI geometry, insensitive to vertex order and noise"""
+
+    geom = shapely.normalize(shapely.set_precision(wkt.loads(aoi), 1e-6))
+
+    return hashlib.sha1(shapely.to_wkb(geom)).hexdigest()[:16]
+
+
+def _gaps(coverage, start, end):
+    """the date ranges of [start, end] that are not covered yet"""
+
+    gaps = []
+    for cstart, cend in sorted(coverage):
+        if cend < start or cstart > end:
+            continue
+        if cstart > start:
+            gaps.append((start, cstart - timedelta(days=1)))
+        start = max(start, cend + timedelta(days=1))
+
+    if start <= end:
+        gaps.append((start, end))
+
+    return gaps
+
+
+def _merge(coverage):
+    """merge the overlapping and contiguous date ranges"""
+
+    merged = []
+    for start, end in sorted(coverage):
+        if merged and start <= merged[-1][1] + timedelta(days=1):
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+
+    return merged
+
+
+def cached_search(s1_slc, start, end, base_url):
+    """
+    Search the Sentinel-1 inventory of the project AOI through an on-disk cache.
+
+    The cache is keyed by the normalized AOI geometry and stores every acquisition
+    already retrieved for it along with the date ranges that were covered. Only
+    the date ranges of the request that are not covered are sent to the hub. The
+    last pm.inventory_cache_lag days are never considered as covered as the hub
+    can still publish acquisitions for them.
+
+    Return:
+        (Path): the inventory file of the project, filtered to [start, end], None
+            if there is no acquisition over the AOI for these dates
+    """
+
+    cache_dir = pm.cache_dir / "inventory" / aoi_key(s1_slc.aoi)
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    cache_file = cache_dir / "inventory.pkl"
+    coverage_file = cache_dir / "coverage.json"
+
+    start = dt.strptime(start, "%Y-%m-%d").date()
+    end = dt.strptime(end, "%Y-%m-%d").date()
+
+    coverage, inventories = [], []
+    if coverage_file.is_file() and cache_file.is_file():
+        coverage = [
+            tuple(date.fromisoformat(d) for d in r)
+            for r in json.loads(coverage_file.read_text())
+        ]
+        inventories.append(pd.read_pickle(cache_file))
+
+    # query the hub for the missing date ranges, OST leaves the inventory
+    # unchanged when nothing is found
+    for gap_start, gap_end in _gaps(coverage, start, end):
+        s1_slc.start, s1_slc.end = gap_start.isoformat(), gap_end.isoformat()
+        s1_slc.inventory = None
+        s1_slc.search(base_url=base_url)
+        if s1_slc.inventory is not None:
+            inventories.append(s1_slc.inventory)
+
+        last_complete = date.today() - timedelta(days=pm.inventory_cache_lag)
+        if gap_start <= last_complete:
+            coverage.append((gap_start, min(gap_end, last_complete)))
+
+    s1_slc.start, s1_slc.end = start.isoformat(), end.isoformat()
+
+    # nothing was ever found over the aoi, there is nothing to cache
+    if not inventories:
+        return None
+
+    # update the cache
+    inventory = pd.concat(inventories).drop_duplicates("identifier")
+    inventory.to_pickle(cache_file)
+    coverage = [[s.isoformat(), e.isoformat()] for s, e in _merge(coverage)]
+    coverage_file.write_text(json.dumps(coverage))
+
+    # keep the acquisitions of the requested dates in the project inventory
+    dates = inventory.acquisitiondate
+    inventory = inventory[
+        (dates >= start.strftime("%Y%m%d")) & (dates <= end.strftime("%Y%m%d"))
+    ]
+    if inventory.empty:
+        return None
+
+    s1_slc.inventory_file = s1_slc.inventory_dir / "full.inventory.gpkg"
+    inventory.to_file(s1_slc.inventory_file, driver="GPKG")
+
+    return s1_slc.inventory_file
@@ -0,0 +1,283 @@
+import atexit
+import importlib
+import multiprocessing as mp
+import os
+import queue
+import signal
+import threading
+import time
+import traceback
+from itertools import count
+from types import SimpleNamespace
+
+from .startup import _record
+
+# the worker processes are spawned so that they don't inherit the kernel threads
+ctx = mp.get_context("spawn")
+
+
+class ProgressOutput:
+    """
+    Output of a run in a worker process.
+
+    The messages of the pipeline and the progress of its stages are sent as
+    events to the kernel, the progress events carry the stage, the percentage of
+    the run and the estimated remaining time in seconds.
+    """
+
+    def __init__(self, events):
+
+        self.events = events
+        self.start = time.perf_counter()
+
+    def add_live_msg(self, msg, type_="info"):
+        self.events.put({"kind": "message", "msg": msg, "type_": type_, "live": True})
+
+    def append_msg(self, msg, section=False, type_="info"):
+        self.events.put({"kind": "message", "msg": msg, "type_": type_, "live": False})
+
+    def progress(self, stage, fraction):
+
+        elapsed = time.perf_counter() - self.start
+        eta = elapsed * (1 - fraction) / fraction if fraction else None
+        self.events.put(
+            {
+                "kind": "progress",
+                "stage": stage,
+                "percent": round(100 * fraction, 1),
+                "eta": None if eta is None else round(eta),
+            }
+        )
+
+
+def _worker(inputs, events):
+    """
+    Import the processing modules, then wait for the inputs of a run, run
+    create_dmp (or monitor_dmp) and report its end.
+    """
+
+    # own process group so that the OST workers are cancelled with the run
+    os.setpgrp()
+
+    start = time.perf_counter()
+    try:
+        process = importlib.import_module("component.scripts.process")
+        monitor = importlib.import_module("component.scripts.monitor")
+        _record("warm_up", time.perf_counter() - start)
+    except Exception as e:
+        traceback.print_exc()
+        inputs.get()
+        events.put({"kind": "status", "status": "failed", "error": str(e)})
+        return
+
+    # the worker stops if the kernel is gone before it gets a run
+    while True:
+        try:
+            aoi_model, model = inputs.get(timeout=5)
+            break
+        except queue.Empty:
+            if not mp.parent_process().is_alive():
+                return
+
+    run = monitor.monitor_dmp if model.monitor else process.create_dmp
+    output = ProgressOutput(events)
+    try:
+        run(aoi_model, model, output, output.progress)
+        events.put({"kind": "status", "status": "done", "dry_run": model.dry_run})
+    except Exception as e:
+        traceback.print_exc()
+        events.put({"kind": "status", "status": "failed", "error": str(e)})
+
+
+class _Worker:
+    """worker process started ahead of its run, it imports the processing modules while it waits"""
+
+    def __init__(self):
+
+        self.inputs = ctx.Queue()
+        self.events = ctx.Queue()
+        self.process = ctx.Process(target=_worker, args=(self.inputs, self.events))
+        self.process.start()
+
+
+class DmpJob:
+    """
+    Handle of a damage proxy map run.
+
+    The inputs are copied from the models when the job is created so that they
+    can be changed in the interface while the job waits or runs. The callbacks
+    subscribed with on_event receive every event of the run.
+    """
+
+    _ids = count(1)
+
+    def __init__(self, aoi_model, model):
+
+        self.id = next(self._ids)
+        self.aoi_model = SimpleNamespace(name=aoi_model.name, gdf=aoi_model.gdf)
+        self.model = SimpleNamespace(
+            event_start=model.event_start,
+            event_end=model.event_end,
+            username=model.username,
+            password=model.password,
+            dry_run=model.dry_run,
+            monitor=model.monitor,
+            zones_file=model.zones_file,
+        )
+
+        self.status = "queued"
+        self.events = []
+        self._callbacks = []
+        self._process = None
+        self._lock = threading.Lock()
+
+    def on_event(self, callback):
+        """subscribe a callback to the events of the job"""
+
+        self._callbacks.append(callback)
+
+        return self
+
+    def _emit(self, event):
+
+        event = {"job": self.id, **event}
+        if event["kind"] == "status":
+            self.status = event["status"]
+        self.events.append(event)
+        [callback(event) for callback in self._callbacks]
+
+    def run(self, worker=None):
+        """run the job in a worker process (a new one by default) and forward its events until it ends"""
+
+        with self._lock:
+            if self.status == "cancelled":
+                return
+
+            try:
+                worker = worker or _Worker()
+            except Exception as e:
+                self._emit({"kind": "status", "status": "failed", "error": str(e)})
+                return
+            self._process = worker.process
+            worker.inputs.put((self.aoi_model, self.model))
+            self._emit({"kind": "status", "status": "running"})
+
+        events = worker.events
+
+        # the events that arrive after a cancellation are dropped
+        died = {"kind": "status", "status": "failed", "error": "the worker died"}
+        while self.status == "running":
+            try:
+                event = events.get(timeout=1)
+            except queue.Empty:
+                event = None if self._process.is_alive() else died
+
+            with self._lock:
+                if event is not None and self.status == "running":
+                    self._emit(event)
+
+        self._process.join()
+
+        return
+
+    def cancel(self):
+        """cancel the job, the finished stages are kept in the manifest"""
+
+        with self._lock:
+            if self.status in ["done", "failed", "cancelled"]:
+                return
+
+            # the worker may not lead its process group yet
+            if self._process is not None and self._process.is_alive():
+                try:
+                    os.killpg(self._process.pid, signal.SIGTERM)
+                except ProcessLookupError:
+                    self._process.terminate()
+
+            self._emit({"kind": "status", "status": "cancelled"})
+
+        return
+
+    def resume(self):
+        """a new job with the same inputs, the up to date stages will be skipped"""
+
+        job = DmpJob(self.aoi_model, self.model)
+        job._callbacks = list(self._callbacks)
+
+        return job
+
+
+class JobQueue:
+    """
+    Queue of the damage proxy map runs.
+
+    The jobs are run one after the other by a thread of the kernel, each one in
+    its own worker process, so that the interface is never blocked. The worker
+    of the next job is started in advance so that it has already imported the
+    processing modules when the job is submitted.
+    """
+
+    def __init__(self):
+
+        self.jobs = []
+        self._queue = queue.Queue()
+        self._worker = _Worker()
+        self._thread = threading.Thread(target=self._consume, daemon=True)
+        self._thread.start()
+
+        # the idle worker would keep the kernel from exiting
+        atexit.register(self._close)
+
+    def _close(self):
+
+        worker = self._worker
+        if worker is not None and worker.process.is_alive():
+            worker.process.terminate()
+
+    def _consume(self):
+
+        # a failing job should not stop the queue
+        while True:
+            job = self._queue.get()
+            if job.status == "cancelled":
+                continue
+
+            worker, self._worker = self._worker, None
+            if worker is None or not worker.process.is_alive():
+                worker = None
+            try:
+                job.run(worker)
+            except Exception:
+                traceback.print_exc()
+
+            # warm up the worker of the next job once this one is over
+            try:
+                self._worker = _Worker()
+            except Exception:
+                traceback.print_exc()
+
+    def submit(self, job):
+        """queue a job and return it"""
+
+        self.jobs.append(job)
+        job._emit({"kind": "status", "status": "queued"})
+        self._queue.put(job)
+
+        return job
+
+
+_job_queue = None
+
+
+def __getattr__(name):
+    """create the queue of all the runs of the kernel on first use, not in the workers"""
+
+    global _job_queue
+
+    if name != "job_queue":
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+    if _job_queue is None:
+        _job_queue = JobQueue()
+
+    return _job_queue
@@ -0,0 +1,130 @@
+import hashlib
+import json
+import threading
+from pathlib import Path
+
+from .trace import Tracer
+
+
+def fingerprint(file):
+    """cheap fingerprint of a file based on its size and modification time"""
+
+    file = Path(file)
+    if not file.is_file():
+        return None
+
+    stat = file.stat()
+    return f"{stat.st_size}-{stat.st_mtime_ns}"
+
+
+def hash_params(params):
+    """stable hash of json serializable parameters"""
+
+    dump = json.dumps(params, sort_keys=True, default=str)
+    return hashlib.sha1(dump.encode()).hexdigest()
+
+
+class Manifest:
+    """
+    Record of the pipeline stages of a project.
+
+    Each stage is saved in the manifest.json file of the project with the
+    fingerprints of its input files, the hash of its parameters and the
+    fingerprints of its outputs. A stage is up to date when none of them changed,
+    so that re-running the pipeline only executes the stages that are affected by
+    a change and the ones after them. The executed stages are instrumented by the
+    tracer.
+    """
+
+    def __init__(self, project_dir, tracer=None, progress=None):
+
+        self.file = Path(project_dir) / "manifest.json"
+        self.tracer = tracer or Tracer()
+        self._lock = threading.Lock()
+
+        # progress(stage, fraction) is called after each stage once the total is known
+        self.progress = progress
+        self.total = 0
+        self.done = 0
+
+        self.stages = {}
+        if self.file.is_file():
+            self.stages = json.loads(self.file.read_text())
+
+    def _key(self, inputs, params):
+        """the inputs and parameters of a stage as saved in the manifest"""
+
+        return {
+            "inputs": {str(f): fingerprint(f) for f in inputs},
+            "params": hash_params(params),
+        }
+
+    def is_done(self, name, inputs=[], params={}):
+        """check if a stage is up to date"""
+
+        record = self.stages.get(name)
+        if record is None:
+            return False
+
+        key = self._key(inputs, params)
+        if record["inputs"] != key["inputs"] or record["params"] != key["params"]:
+            return False
+
+        return all(
+            fp is not None and fingerprint(f) == fp
+            for f, fp in record["outputs"].items()
+        )
+
+    def expect(self, total):
+        """set the number of stages of the run to report its progress"""
+
+        self.total = total
+
+        return
+
+    def _report(self, name):
+        """report the progress of the run once a stage is finished"""
+
+        with self._lock:
+            self.done += 1
+            fraction = min(1, self.done / self.total) if self.total else None
+
+        if self.progress is not None and fraction is not None:
+            self.progress(name, fraction)
+
+        return
+
+    def outputs(self, name):
+        """the outputs of a recorded stage"""
+
+        return [Path(f) for f in self.stages[name]["outputs"]]
+
+    def run(self, name, func, inputs=[], params={}):
+        """
+        Run a stage unless it is up to date.
+
+        func must return the list of the files produced by the stage. Files that
+        are expected but missing can be included, the stage will then be run again
+        next time.
+
+        Return:
+            (list): the output files of the stage
+        """
+
+        if self.is_done(name, inputs, params):
+            self._report(name)
+            return self.outputs(name)
+
+        with self.tracer.span(name):
+            outputs = func()
+
+        record = self._key(inputs, params)
+        record["outputs"] = {str(f): fingerprint(f) for f in outputs}
+
+        with self._lock:
+            self.stages[name] = record
+            self.file.write_text(json.dumps(self.stages, indent=2))
+
+        self._report(name)
+
+        return [Path(f) for f in outputs]
@@ -0,0 +1,338 @@
+"""
+Incremental monitoring of an event.
+
+The coherence of every pair of acquisitions of a burst is kept in a history
+folder as a tiled GeoTIFF, next to the running maximum of the pre-event pairs
+and the running minimum of the post-event pairs. A new acquisition only adds its
+pair with the previous one: the running products are updated block by block and
+the damage proxy map of the new date and the cumulative one are exported
+without processing the older scenes again.
+"""
+
+import json
+import re
+import shutil
+from datetime import datetime as dt
+from datetime import timedelta
+from pathlib import Path
+
+import numpy as np
+import rasterio as rio
+from rasterio.vrt import WarpedVRT
+
+from component import parameter as pm
+
+from .ccd import compute_ccd
+from .planner import plan_acquisitions
+from .process import (
+    ard_track,
+    clone_project,
+    close_project,
+    export_track,
+    get_project_dir,
+    open_project,
+    prepare_processing,
+    search_inventory,
+)
+from .prune import aoi_geometry
+from .resources import get_workers
+
+
+def _write_tiled(src_file, dst_file, grid_file=None):
+    """copy a coherence layer as a tiled float32 GeoTIFF, on the grid of grid_file if provided"""
+
+    grid_file = grid_file or src_file
+    with rio.open(src_file) as src, rio.open(grid_file) as grid:
+
+        profile = grid.profile.copy()
+        profile.update(
+            driver="GTiff",
+            dtype="float32",
+            count=1,
+            nodata=np.nan,
+            tiled=True,
+            blockxsize=pm.block_size,
+            blockysize=pm.block_size,
+            compress="lzw",
+        )
+
+        # the bursts of a new run may be geocoded on a slightly different extent
+        same_grid = (src.shape, src.transform) == (grid.shape, grid.transform)
+        vrt = None
+        if not same_grid:
+            vrt = WarpedVRT(
+                src,
+                crs=grid.crs,
+                transform=grid.transform,
+                width=grid.width,
+                height=grid.height,
+                nodata=np.nan,
+            )
+
+        try:
+            with rio.open(dst_file, "w", **profile) as dst:
+                for _, window in dst.block_windows(1):
+                    data = (vrt or src).read(1, window=window, out_dtype="float32")
+                    dst.write(data, 1, window=window)
+        finally:
+            if vrt is not None:
+                vrt.close()
+
+    return dst_file
+
+
+def _accumulate(running_file, coh_file, func):
+    """fold a coherence layer in a running product block by block"""
+
+    if not running_file.is_file():
+        shutil.copy(coh_file, running_file)
+        return running_file
+
+    part_file = running_file.with_name(f"{running_file.stem}.part.tif")
+    with rio.open(running_file) as running, rio.open(coh_file) as coh:
+        with rio.open(part_file, "w", **running.profile) as dst:
+            for _, window in running.block_windows(1):
+                dst.write(
+                    func(running.read(1, window=window), coh.read(1, window=window)),
+                    1,
+                    window=window,
+                )
+    part_file.replace(running_file)
+
+    return running_file
+
+
+class CoherenceHistory:
+    """
+    Coherence history of the bursts of a track.
+
+    The layers are stored in store_dir/<burst> as coh_<first>_<second>.tif, the
+    running products as pre_max.tif and post_min.tif and the CCD of each
+    post-event date and the cumulative one in <date>/ and cumulative/. The dates
+    whose maps are exported are recorded in store_dir/state_<track>.json. A pair
+    is pre-event if its second date is before the event date (YYYYMMDD).
+    """
+
+    def __init__(self, store_dir, track, event_date):
+
+        self.store_dir = Path(store_dir)
+        self.store_dir.mkdir(parents=True, exist_ok=True)
+        self.event_date = event_date
+
+        self.state_file = self.store_dir / f"state_{track}.json"
+        self.state = {"dates": []}
+        if self.state_file.is_file():
+            self.state = json.loads(self.state_file.read_text())
+
+    @property
+    def dates(self):
+        return self.state["dates"]
+
+    def _add_pairs(self, burst, dates):
+        """store the new coherence pairs of a burst and return the post-event ones by date"""
+
+        # the timeseries layers are named after the first date of their pair
+        layers = {}
+        for file in burst.glob("Timeseries/*.coh.VV.tif"):
+            layers[re.findall(r"\d{8}", file.name)[0]] = file
+
+        burst_dir = self.store_dir / burst.name
+        burst_dir.mkdir(exist_ok=True)
+        pre_max = burst_dir / "pre_max.tif"
+        post_min = burst_dir / "post_min.tif"
+
+        # adding a pair twice doesn't change the running products
+        post_pairs = {}
+        for first, second in zip(dates, dates[1:]):
+            if first not in layers:
+                continue
+
+            grid_file = pre_max if pre_max.is_file() else None
+            coh_file = _write_tiled(
+                layers[first], burst_dir / f"coh_{first}_{second}.tif", grid_file
+            )
+
+            if second < self.event_date:
+                _accumulate(pre_max, coh_file, np.fmax)
+            else:
+                _accumulate(post_min, coh_file, np.fmin)
+                post_pairs[second] = coh_file
+
+        return post_pairs
+
+    def update(self, bursts, dates, aoi=None):
+        """
+        Add the coherence pairs of the dates to the history of the bursts.
+
+        The CCD of every new post-event date and the cumulative CCD are computed
+        over the AOI geometry if provided. Return the new post-event dates.
+        """
+
+        new_dates = set()
+        for burst in bursts:
+            post_pairs = self._add_pairs(burst, dates)
+
+            burst_dir = self.store_dir / burst.name
+            pre_max = burst_dir / "pre_max.tif"
+            post_min = burst_dir / "post_min.tif"
+
+            # the bursts without a pre-event reference can't be compared
+            if not pre_max.is_file():
+                continue
+
+            for date, coh_file in post_pairs.items():
+                (burst_dir / date).mkdir(exist_ok=True)
+                ccd_file = burst_dir / date / f"ccd_{burst.name}.tif"
+                compute_ccd(coh_file, pre_max, ccd_file, aoi=aoi)
+                new_dates.add(date)
+
+            if post_min.is_file():
+                (burst_dir / "cumulative").mkdir(exist_ok=True)
+                ccd_file = burst_dir / "cumulative" / f"ccd_{burst.name}.tif"
+                compute_ccd(post_min, pre_max, ccd_file, aoi=aoi)
+
+        return sorted(new_dates)
+
+    def save(self, dates):
+        """
+        Record the dates as done once their maps are exported.
+
+        Until then a failed or cancelled run processes them again, folding the
+        same pairs doesn't change the running products.
+        """
+
+        self.state["dates"] = sorted({*self.dates, *dates})
+        self.state_file.write_text(json.dumps(self.state, indent=2))
+
+        return
+
+    def ccd_files(self, name):
+        """CCD files of the bursts for a post-event date or "cumulative" """
+
+        return sorted(self.store_dir.glob(f"*/{name}/ccd_*.tif"))
+
+
+def monitor_dmp(aoi_model, model, output, progress=None):
+    """
+    Extend the damage proxy maps of an event with the acquisitions made since the
+    last run.
+
+    The first run processes the dates selected by the planner and all the later
+    acquisitions of each track, the next ones only the pairs of the new
+    acquisitions with the last processed one. The maps of each new date are
+    exported in Damage_Proxy_Maps/<date> and the cumulative ones in
+    Damage_Proxy_Maps/cumulative.
+    """
+
+    output.add_live_msg("Initializing DPM monitoring")
+    event_start = dt.strptime(model.event_start, "%Y-%m-%d")
+    event_end = dt.strptime(model.event_end, "%Y-%m-%d")
+    event_date = event_start.strftime("%Y%m%d")
+
+    # search up to today to find the new acquisitions
+    search_start = dt.strftime(event_start + timedelta(days=-60), "%Y-%m-%d")
+    search_end = dt.strftime(dt.now(), "%Y-%m-%d")
+
+    project_dir = get_project_dir(aoi_model, model)
+    aoi = aoi_model.gdf.dissolve().geometry.to_wkt().values[0]
+
+    s1_slc, manifest = open_project(
+        project_dir,
+        aoi,
+        search_start,
+        search_end,
+        output,
+        model.username,
+        model.password,
+        progress,
+    )
+    tracer = manifest.tracer
+    search_inventory(s1_slc, search_start, search_end, manifest, output)
+
+    # the dates of each track that are not in its history yet
+    inventory = s1_slc.inventory
+    plan = plan_acquisitions(
+        inventory, s1_slc.aoi, event_start, event_end, get_workers()
+    )
+    if plan.empty:
+        output.add_live_msg(" No Sentinel-1 data found for the event", "warning")
+        return plan
+
+    histories, increments = {}, {}
+    for track, row in plan.iterrows():
+        if row.message:
+            output.append_msg(f" {row.message} for track {track}")
+            continue
+
+        history = CoherenceHistory(project_dir / "Monitoring", track, event_date)
+        track_dates = inventory[inventory.relativeorbit == track].acquisitiondate
+        dates = history.dates[-1:] or list(row.dates)
+        dates += sorted(d for d in track_dates.unique() if d > dates[-1])
+        if len(dates) < 2:
+            output.append_msg(f" No new acquisition for track {track}")
+            continue
+
+        histories[track], increments[track] = history, dates
+        output.append_msg(f" Track {track}: {', '.join(dates[1:])} to process")
+
+    if model.dry_run or not increments:
+        return plan
+
+    scheduler = prepare_processing(s1_slc, project_dir, manifest, output)
+    dpm_out_dir = project_dir / "Damage_Proxy_Maps"
+
+    def run_track(track):
+        dates = increments[track]
+        key = f"{track}_{dates[0]}_{dates[-1]}"
+
+        # each increment is processed in its own folder
+        processing_dir = Path(s1_slc.processing_dir) / "monitor" / key
+        track_slc = clone_project(s1_slc, processing_dir)
+
+        # only the coherence of the new pairs is needed, not their timescan
+        coh_files = ard_track(
+            track_slc,
+            track,
+            dates,
+            output,
+            scheduler,
+            manifest,
+            key=key,
+            timescan=False,
+        )
+
+        output.add_live_msg(f" Update the coherence history of track {track}")
+        bursts = sorted({f.parent.parent for f in coh_files})
+        with scheduler.cpu_phase(), tracer.span(f"history_{key}"):
+            new_dates = histories[track].update(bursts, dates, aoi_geometry(s1_slc.aoi))
+
+        for name in [*new_dates, "cumulative"]:
+            ccd_files = histories[track].ccd_files(name)
+            if not ccd_files:
+                continue
+            export_track(
+                ccd_files,
+                f"{track}_{name}",
+                aoi_model.gdf,
+                dpm_out_dir / name,
+                output,
+                scheduler,
+                manifest,
+                zones_file=model.zones_file,
+            )
+
+        # the maps are exported, the timeseries are not needed anymore
+        histories[track].save(dates)
+        for burst in bursts:
+            shutil.rmtree(burst / "Timeseries", ignore_errors=True)
+
+        return
+
+    errors = scheduler.run(list(increments), run_track)
+    for track, error in errors.items():
+        output.add_live_msg(f" Monitoring failed for track {track}: {error}", "warning")
+
+    failed = [f"track {track}" for track in errors]
+    close_project(s1_slc, manifest, dpm_out_dir / "trace.json", failed, output)
+
+    return plan
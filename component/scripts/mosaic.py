@@ -0,0 +1,141 @@
+import math
+
+import numpy as np
+import rasterio as rio
+from rasterio.features import geometry_mask
+from rasterio.transform import from_origin
+from rasterio.windows import Window, from_bounds
+
+from component import parameter as pm
+
+from .colour import colour_lut, open_dpm, write_dpm
+
+
+def _output_grid(srcs, aoi_gdf=None):
+    """
+    Compute the transform and shape of the output grid.
+
+    The grid uses the resolution of the first source and is aligned on its pixels,
+    it covers the union of the sources, cropped to the AOI if provided.
+    """
+
+    crs = srcs[0].crs
+    xres, yres = srcs[0].res
+    x0, y0 = srcs[0].transform.c, srcs[0].transform.f
+
+    # union of all the sources
+    left = min(src.bounds.left for src in srcs)
+    bottom = min(src.bounds.bottom for src in srcs)
+    right = max(src.bounds.right for src in srcs)
+    top = max(src.bounds.top for src in srcs)
+
+    # crop to the aoi
+    if aoi_gdf is not None:
+        aleft, abottom, aright, atop = aoi_gdf.to_crs(crs).total_bounds
+        left, bottom = max(left, aleft), max(bottom, abottom)
+        right, top = min(right, aright), min(top, atop)
+
+    if left >= right or bottom >= top:
+        raise Exception("The bursts don't intersect the AOI")
+
+    # snap to the pixels of the first source, the offsets in pixels are rounded
+    # first so that the float error of the bounds doesn't add a row or column
+    left = x0 + math.floor(round((left - x0) / xres, 6)) * xres
+    top = y0 - math.floor(round((y0 - top) / yres, 6)) * yres
+    width = math.ceil(round((right - left) / xres, 6))
+    height = math.ceil(round((top - bottom) / yres, 6))
+
+    return from_origin(left, top, xres, yres), width, height
+
+
+def mosaic_to_aoi(files, dstnt_file, aoi_gdf=None, method="max", dpm_file=None):
+    """
+    Mosaic the burst CCD files and crop them to the AOI in a single streaming pass.
+
+    The AOI cropped output grid is computed first and then filled window by window
+    from the sources that intersect it, so that no full size mosaic is held in
+    memory nor written to a temporary file. The nodata (0) pixels of the sources
+    are ignored, overlapping pixels are merged with the "max" or the "first" rule
+    and the pixels outside of the AOI are set to nodata. If a dpm_file is provided
+    the coloured damage proxy map is written from the same blocks.
+    """
+
+    srcs = [rio.open(file) for file in files]
+    dpm = None
+
+    try:
+        transform, width, height = _output_grid(srcs, aoi_gdf)
+        shapes_ = (
+            None if aoi_gdf is None else list(aoi_gdf.to_crs(srcs[0].crs).geometry)
+        )
+
+        meta = srcs[0].profile.copy()
+        meta.update(
+            driver="GTiff",
+            height=height,
+            width=width,
+            transform=transform,
+            dtype="uint8",
+            nodata=0,
+            tiled=True,
+            blockxsize=pm.block_size,
+            blockysize=pm.block_size,
+            compress="lzw",
+        )
+
+        # the dpm is coloured on the fly
+        if dpm_file is not None:
+            dpm = open_dpm(dpm_file, meta)
+        lut = colour_lut()
+
+        with rio.open(dstnt_file, "w", **meta) as dstnt:
+            for _, window in dstnt.block_windows(1):
+
+                bounds = dstnt.window_bounds(window)
+                shape = (srcs[0].count, window.height, window.width)
+                out = np.zeros(shape, dtype="uint8")
+
+                for src in srcs:
+
+                    # skip the sources that don't intersect the window
+                    if (
+                        src.bounds.left >= bounds[2]
+                        or src.bounds.right <= bounds[0]
+                        or src.bounds.bottom >= bounds[3]
+                        or src.bounds.top <= bounds[1]
+                    ):
+                        continue
+
+                    src_window = from_bounds(*bounds, transform=src.transform)
+                    src_window = Window(
+                        round(src_window.col_off),
+                        round(src_window.row_off),
+                        window.width,
+                        window.height,
+                    )
+                    arr = src.read(window=src_window, boundless=True, fill_value=0)
+
+                    if method == "max":
+                        np.maximum(out, arr, out=out)
+                    else:
+                        np.copyto(out, arr, where=out == 0)
+
+                # set the pixels outside of the aoi to nodata
+                if shapes_ is not None:
+                    mask = geometry_mask(
+                        shapes_,
+                        out_shape=(window.height, window.width),
+                        transform=dstnt.window_transform(window),
+                    )
+                    out[:, mask] = 0
+
+                dstnt.write(out, window=window)
+                if dpm is not None:
+                    write_dpm(dpm, out[0], window, lut)
+
+    finally:
+        [src.close() for src in srcs]
+        if dpm is not None:
+            dpm.close()
+
+    return dstnt_file
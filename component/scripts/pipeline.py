@@ -0,0 +1,61 @@
+import threading
+from queue import Queue
+
+from component import parameter as pm
+
+
+def pipelined_ard(dates, download, process, queue_size=pm.pipeline_queue):
+    """
+    Overlap the downloads of the acquisitions with their ARD processing.
+
+    A producer thread downloads the acquisitions from the most recent one and
+    queues them, the caller thread processes each acquisition with the one after
+    it (its coherence partner) as soon as both are on disk. As OST skips the
+    processed acquisitions, the partner of a pair is already processed when the
+    next pair runs and no acquisition is processed twice. The bounded queue
+    limits the number of downloaded acquisitions waiting to be processed.
+
+    Args:
+        dates: the acquisition dates
+        download: function downloading the scenes of a date
+        process: function processing the ARD of a date and its partner date
+        queue_size: the number of downloaded dates that can wait
+    """
+
+    queue = Queue(maxsize=queue_size)
+    stop = threading.Event()
+
+    def produce():
+        try:
+            for date in sorted(dates, reverse=True):
+                if stop.is_set():
+                    return
+                download(date)
+                queue.put(date)
+            queue.put(None)
+        except Exception as e:
+            queue.put(e)
+
+    producer = threading.Thread(target=produce, daemon=True)
+    producer.start()
+
+    try:
+        partner = None
+        while (date := queue.get()) is not None:
+
+            if isinstance(date, Exception):
+                raise date
+
+            if partner is not None:
+                process(date, partner)
+            partner = date
+
+    finally:
+        # unblock the producer if the processing failed
+        stop.set()
+        while producer.is_alive():
+            while not queue.empty():
+                queue.get()
+            producer.join(timeout=1)
+
+    return
@@ -0,0 +1,87 @@
+from bisect import bisect_left
+from datetime import datetime as dt
+
+import pandas as pd
+from shapely import wkt
+
+from component import parameter as pm
+
+
+def select_dates(datelist, event_start, event_end):
+    """
+    Select the acquisitions needed to map an event.
+
+    The 2 acquisitions before the event start are used as pre-event images and
+    all the acquisitions from the event start to the first one after the event
+    end as post-event images.
+
+    Return:
+        (list, list, str): the pre-event dates, the post-event dates and the reason
+            why the track cannot be used (None if it can)
+    """
+
+    datelist = sorted(datelist)
+
+    # check if we have an image after end date
+    if not datelist or datelist[-1] < event_end:
+        return [], [], "No image available after the end date"
+
+    # we need the two images before the start date
+    start_idx = bisect_left(datelist, event_start)
+    if start_idx < 2:
+        return [], [], "Not enough pre-event images available"
+
+    # stop at the first image after the end of the event
+    end_idx = bisect_left(datelist, event_end)
+
+    return datelist[start_idx - 2 : start_idx], datelist[start_idx : end_idx + 1], None
+
+
+def plan_acquisitions(inventory, aoi, event_start, event_end, workers):
+    """
+    Plan the processing of every track of the inventory without running it.
+
+    The number of bursts is estimated from the fraction of each scene footprint
+    that covers the AOI, the download size and processing time from the
+    footprint model of the parameters.
+
+    Return:
+        (pd.DataFrame): the plan of each track indexed by track
+    """
+
+    aoi = wkt.loads(aoi)
+
+    plan = []
+    for track, df in inventory.groupby("relativeorbit"):
+
+        datelist = [dt.strptime(d, "%Y%m%d") for d in df.acquisitiondate.unique()]
+        pre, post, message = select_dates(datelist, event_start, event_end)
+        dates = [d.strftime("%Y%m%d") for d in pre + post]
+        df = df[df.acquisitiondate.isin(dates)]
+
+        # bursts of each date covering the aoi
+        coverage = df.geometry.intersection(aoi).area / df.geometry.area
+        bursts_per_date = (coverage * pm.slc_bursts).groupby(df.acquisitiondate).sum()
+        bursts = int(round(bursts_per_date.max())) if len(df) else 0
+
+        plan.append(
+            {
+                "track": track,
+                "pre_dates": [d.strftime("%Y-%m-%d") for d in pre],
+                "post_dates": [d.strftime("%Y-%m-%d") for d in post],
+                "dates": dates,
+                "slcs": len(df),
+                "bursts": bursts,
+                "download_gb": round(len(df) * pm.slc_size, 1),
+                "processing_hours": round(
+                    bursts * len(dates) * pm.burst_ard_minutes / 60 / workers, 1
+                ),
+                "message": message or "",
+            }
+        )
+
+    # an empty inventory gives an empty plan
+    columns = ["track", "pre_dates", "post_dates", "dates", "slcs", "bursts"]
+    columns += ["download_gb", "processing_hours", "message"]
+
+    return pd.DataFrame(plan, columns=columns).set_index("track")
@@ -0,0 +1,113 @@
+import json
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+import rasterio as rio
+from pyproj import CRS
+
+# little endian WKB encoding of a 2D point
+wkb_point = np.dtype([("order", "u1"), ("type", "<u4"), ("x", "<f8"), ("y", "<f8")])
+
+
+def _damaged_pixels(src):
+    """yield the coordinates and values of the nonzero pixel centres of each block"""
+
+    a, b, c, d, e, f = src.transform[:6]
+
+    for _, window in src.block_windows(1):
+        arr = src.read(1, window=window)
+        rows, cols = np.nonzero(arr)
+
+        if rows.size == 0:
+            continue
+
+        # pixel centres with the affine transform of the block
+        cols = cols + window.col_off + 0.5
+        rows = rows + window.row_off + 0.5
+        xs = a * cols + b * rows + c
+        ys = d * cols + e * rows + f
+
+        yield xs, ys, arr[arr != 0]
+
+
+def _to_wkb(xs, ys):
+    """encode the points as a WKB binary array"""
+
+    points = np.empty(xs.size, dtype=wkb_point)
+    points["order"], points["type"], points["x"], points["y"] = 1, 1, xs, ys
+
+    offsets = np.arange(xs.size + 1, dtype="int32") * wkb_point.itemsize
+    buffers = [None, pa.py_buffer(offsets), pa.py_buffer(points.tobytes())]
+
+    return pa.BinaryArray.from_buffers(pa.binary(), xs.size, buffers)
+
+
+def _geo_schema(crs, fields):
+    """GeoParquet schema of the fields followed by a WKB point geometry column"""
+
+    geo = {
+        "version": "1.0.0",
+        "primary_column": "geometry",
+        "columns": {
+            "geometry": {
+                "encoding": "WKB",
+                "geometry_types": ["Point"],
+                "crs": CRS.from_wkt(crs.to_wkt()).to_json_dict(),
+            }
+        },
+    }
+
+    return pa.schema(
+        [*fields, ("geometry", pa.binary())], metadata={"geo": json.dumps(geo)}
+    )
+
+
+def _write_parquet(src, dstnt_file):
+    """stream the damaged pixels to a GeoParquet file"""
+
+    schema = _geo_schema(src.crs, [("raster_val", pa.uint8())])
+
+    with pq.ParquetWriter(dstnt_file, schema, compression="zstd") as writer:
+        for xs, ys, vals in _damaged_pixels(src):
+            table = pa.Table.from_arrays(
+                [pa.array(vals), _to_wkb(xs, ys)], schema=schema
+            )
+            writer.write_table(table)
+
+
+def _write_geojson(src, dstnt_file):
+    """stream the damaged pixels to a GeoJSON file"""
+
+    feature = (
+        '{{"type": "Feature", "properties": {{"raster_val": {}}}, '
+        '"geometry": {{"type": "Point", "coordinates": [{!r}, {!r}]}}}}'
+    )
+
+    with open(dstnt_file, "w") as f:
+        f.write('{"type": "FeatureCollection", "features": [\n')
+        sep = ""
+        for xs, ys, vals in _damaged_pixels(src):
+            features = ",\n".join(
+                feature.format(*v) for v in zip(vals.tolist(), xs.tolist(), ys.tolist())
+            )
+            f.write(sep + features)
+            sep = ",\n"
+        f.write("\n]}\n")
+
+
+def export_points(ccd_file, dstnt_file):
+    """
+    Export the damaged pixels of a CCD raster as points.
+
+    The nonzero pixel centres and values are extracted with NumPy block by block and
+    streamed to the destination file. The format is given by its suffix: ".parquet"
+    (GeoParquet) or ".geojson".
+    """
+
+    writers = {".parquet": _write_parquet, ".geojson": _write_geojson}
+
+    with rio.open(ccd_file) as src:
+        writers[dstnt_file.suffix](src, dstnt_file)
+
+    return dstnt_file
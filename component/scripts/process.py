@@ -1,74 +1,133 @@
-import os
 import shutil
-import re
 
 from datetime import datetime as dt
 from datetime import timedelta
+from copy import deepcopy, copy
 from pathlib import Path
-import requests
 
-import numpy as np
 import geopandas as gpd
-from osgeo import gdal
-import rasterio as rio
-from rasterio.merge import merge
-from rasterio.features import shapes
-
 from ost import Sentinel1Batch
 from ost.helpers import srtm
 
 from component import parameter as pm
 
+from .asf import check_products_on_asf
+from .cache import product_cache
+from .ccd import ccd_bursts
+from .clusters import export_clusters
+from .export import export_kmz, to_cog
+from .inventory import cached_search
+from .manifest import Manifest
+from .mosaic import mosaic_to_aoi
+from .pipeline import pipelined_ard
+from .planner import plan_acquisitions
+from .points import export_points
+from .prune import aoi_geometry, prune_bursts
+from .resources import cpu_limit, get_workers
+from .scheduler import TrackScheduler
+from .storage import tmp_storage
+from .tiles import export_tiles, tiles_to_kmz
+from .trace import Tracer
+from .zonal import export_zonal_stats
+
+
+def create_dmp(aoi_model, model, output, progress=None):
+
+    output.add_live_msg("Initializing DPM creation")
+    # create start date from 60 days before
+    event_start = dt.strptime(model.event_start, "%Y-%m-%d")
+    event_end = dt.strptime(model.event_end, "%Y-%m-%d")
+
+    # set a period around start and end date for data search
+    search_start = dt.strftime(event_start + timedelta(days=-60), "%Y-%m-%d")
+    search_end = dt.strftime(event_end + timedelta(days=30), "%Y-%m-%d")
+
+    project_dir = get_project_dir(aoi_model, model)
+    aoi = aoi_model.gdf.dissolve().geometry.to_wkt().values[0]
+
+    s1_slc, manifest = open_project(
+        project_dir,
+        aoi,
+        search_start,
+        search_end,
+        output,
+        model.username,
+        model.password,
+        progress,
+    )
+    search_inventory(s1_slc, search_start, search_end, manifest, output)
 
-def check_product_on_asf(identifier, uname, pword):
-    
-    url = f"https://datapool.asf.alaska.edu/SLC/SA/{identifier}.zip"
-    with requests.Session() as session:
-        session.auth = (uname, pword)
-        request = session.request("get", url)
-        response = session.get(request.url, auth=(uname, pword), stream=True)
-        return response.status_code
-    
-    
-def check_computer_size():
-    """check if the computer size will match the reuirements of the app"""
-
-    # we get available ram
-    with open("/proc/meminfo") as f:
-        meminfo = f.read()
-        matched = re.search(r"^MemTotal:\s+(\d+)", meminfo)
-
-    if matched:
-        mem_total_kB = int(matched.groups()[0])
-
-    # we check if available ram and cpus are enough
-    if mem_total_kB / 1024 / 1024 < 30 or os.cpu_count() < 4:
-        raise Exception(
-            "WARNING: You should run this notebook with an instance of at least 32Gb of Ram and 4 CPUs."
+    # select the acquisitions of each track
+    plan = plan_acquisitions(
+        s1_slc.inventory, s1_slc.aoi, event_start, event_end, get_workers()
+    )
+    if plan.empty:
+        output.add_live_msg(" No Sentinel-1 data found for the event", "warning")
+        return plan
+
+    for track, row in plan.iterrows():
+        if row.message:
+            output.append_msg(f" {row.message} for track {track}")
+        else:
+            output.append_msg(
+                f" Track {track}: {row.slcs} SLCs, ~{row.bursts} bursts, "
+                f"{row.download_gb} GB to download, "
+                f"~{row.processing_hours} h of processing"
+            )
+
+    # stop here if we only want to size the processing
+    if model.dry_run:
+        return plan
+
+    scheduler = prepare_processing(s1_slc, project_dir, manifest, output)
+
+    # process all the tracks concurrently
+    tracks = plan[plan.message == ""].index
+    track_stages = 8 if pm.ard_pipeline else 9
+    manifest.expect(len(tracks) * track_stages)
+
+    def run_track(track):
+        return process_track(
+            s1_slc,
+            track,
+            plan.dates[track],
+            aoi_model,
+            project_dir,
+            output,
+            scheduler,
+            manifest,
+            zones_file=model.zones_file,
         )
 
-    return
+    errors = scheduler.run(tracks, run_track)
+    for track, error in errors.items():
+        output.add_live_msg(f" Processing failed for track {track}: {error}", "warning")
 
+    # save the trace next to the outputs
+    trace_file = project_dir / "Damage_Proxy_Maps" / "trace.json"
+    failed = [f"track {track}" for track in errors]
+    close_project(s1_slc, manifest, trace_file, failed, output)
 
-def create_dmp(aoi_model, model, output):
+    return
 
-    output.add_live_msg('Initializing DPM creation')
-    # create start date from 60 days before
-    event_start = dt.strptime(model.event_start, "%Y-%m-%d")
-    event_end = dt.strptime(model.event_end, "%Y-%m-%d")
 
-    # set a period around start and end date for data search
-    search_start = dt.strftime(event_start + timedelta(days=-60), '%Y-%m-%d')
-    search_end = dt.strftime(event_end + timedelta(days=30), '%Y-%m-%d')
+def open_project(
+    project_dir,
+    aoi,
+    search_start,
+    search_end,
+    output,
+    username=None,
+    password=None,
+    progress=None,
+):
+    """
+    Set up the OST project of a run over the AOI (WKT) and the search dates.
 
-    # define project dir
-    if event_start == event_end:
-        project_dir = pm.result_dir / f"{aoi_model.name}_{model.event_start}"
-    else:
-        project_dir = pm.result_dir / f"{aoi_model.name}_{model.event_start}_{model.event_end}"
+    Return the Sentinel1Batch with its temporary dir and credentials set and the
+    manifest that records the stages of the project to resume them.
+    """
 
-    aoi = aoi_model.gdf.dissolve().geometry.to_wkt().values[0]
-    
     output.add_live_msg(" Setting up OST project")
     s1_slc = Sentinel1Batch(
         project_dir=project_dir,
@@ -80,31 +139,86 @@ def create_dmp(aoi_model, model, output):
     )
 
     # set tmp_dir
-    s1_slc.temp_dir = pm.tmp_dir
-    s1_slc.config_dict["temp_dir"] = pm.tmp_dir
-
-    ## we get available ram
-    #with open('/proc/meminfo') as f:
-    #    meminfo = f.read()
-    #    matched = re.search(r'^MemTotal:\s+(\d+)', meminfo)
-    #
-    #if matched:
-    #    mem_total_kB = int(matched.groups()[0])
-    #
-    ## if we have more than 100GB ram we download there,
-    ## that should speed up processing
-    #if mem_total_kB/1024/1024 > 100:
-    #    print('Using ramdisk')
-    #    s1_slc.download_dir = '/ram/download'
-    #    Path(s1_slc.download_dir).mkdir(parents=True, exist_ok=True)
-    #    s1_slc.config_dict['download_dir'] = s1_slc.download_dir
-    
-    # get username and password
+    s1_slc.temp_dir = tmp_storage.tmp_dir
+    s1_slc.config_dict["temp_dir"] = str(tmp_storage.tmp_dir)
+
+    set_credentials(s1_slc, username, password)
+
+    return s1_slc, Manifest(project_dir, Tracer(), progress)
+
+
+def prepare_processing(s1_slc, project_dir, manifest, output):
+    """set the ARD parameters, pre-download the SRTM and return the track scheduler"""
+
+    output.add_live_msg(" Setting processing parameters")
+    workers = set_ard_parameters(s1_slc)
+    output.add_live_msg(f" Processing {workers} bursts in parallel.")
+    output.append_msg(f" Temporary storage: {tmp_storage.report()}")
+
+    with manifest.tracer.span("srtm"):
+        srtm.download_srtm(s1_slc.aoi)
+
+    return TrackScheduler(
+        project_dir, cpu_slots=pm.track_cpu_slots, io_slots=pm.track_io_slots
+    )
+
+
+def clone_project(s1_slc, processing_dir):
+    """copy of the project that processes its products in its own folder"""
+
+    clone = copy(s1_slc)
+    clone.config_dict = deepcopy(s1_slc.config_dict)
+    clone.processing_dir = Path(processing_dir)
+    clone.processing_dir.mkdir(parents=True, exist_ok=True)
+    clone.config_dict["processing_dir"] = str(clone.processing_dir)
+
+    return clone
+
+
+def close_project(s1_slc, manifest, trace_file, failed, output):
+    """
+    Save the trace of a run in trace_file and remove its downloads.
+
+    If some parts of the run failed their intermediate files are kept and an
+    exception listing them is raised so that the run can be resumed. The
+    processing dir is always kept as it only contains the small products needed
+    to resume from the CCD stage, the downloads are only links to the product
+    cache.
+    """
+
+    tracer = manifest.tracer
+    Path(trace_file).parent.mkdir(parents=True, exist_ok=True)
+    tracer.save(trace_file)
+
+    if failed:
+        raise Exception(f"Processing failed for {', '.join(failed)}, resume the run")
+
+    with tracer.span("cleanup"):
+        shutil.rmtree(s1_slc.download_dir, ignore_errors=True)
+
+    tracer.save(trace_file)
+    output.add_live_msg(tracer.summary())
+
+    return
+
+
+def get_project_dir(aoi_model, model):
+    """result folder of the event over the AOI"""
+
+    if model.event_start == model.event_end:
+        return pm.result_dir / f"{aoi_model.name}_{model.event_start}"
+
+    return pm.result_dir / f"{aoi_model.name}_{model.event_start}_{model.event_end}"
+
+
+def set_credentials(s1_slc, username=None, password=None):
+    """set the scihub and ASF credentials of the project, default to the SEPAL ones"""
+
     from ost.helpers.settings import HERBERT_USER
 
-    if model.username and model.password:
-        s1_slc.scihub_uname = model.username
-        s1_slc.scihub_pword = model.password
+    if username and password:
+        s1_slc.scihub_uname = username
+        s1_slc.scihub_pword = password
     else:
         s1_slc.scihub_uname = HERBERT_USER["uname"]
         s1_slc.scihub_pword = HERBERT_USER["pword"]
@@ -112,325 +226,447 @@ def create_dmp(aoi_model, model, output):
     s1_slc.asf_uname = HERBERT_USER["uname"]
     s1_slc.asf_pword = HERBERT_USER["asf_pword"]
 
-    output.add_live_msg(" Searching for data")
+    return
 
-    s1_slc.search(base_url="https://scihub.copernicus.eu/dhus/")
-    
-    for i, track in enumerate(s1_slc.inventory.relativeorbit.unique()):
-        
-        # filter by track
-        df = s1_slc.inventory[s1_slc.inventory.relativeorbit == track].copy()
-        
-        # make sure all products are on ASF
-        for i, row in df.iterrows():
-            status = check_product_on_asf(row.identifier, s1_slc.asf_uname, s1_slc.asf_pword)
-            if status != 200:
-                df = df[df.identifier != row.identifier]
-                
-        # get all acquisitions dates for that track
-        datelist = sorted([dt.strptime(date, '%Y%m%d') for date in df.acquisitiondate.unique()])
-        to_process_list = []
-        for date in datelist:
-            
-            # cehck if we have an image after end date
-            if datelist[-1] < event_end:
-                output.add_live_msg(f' No image available after the end date for track {track}')
-                break
-                
-            # ignore dates before start of event
-            if date < event_start:
-                continue
-            
-            # get index of date in datelist
-            idx = datelist.index(date)
-            if idx < 2:
-                output.add_live_msg(f' Not enough pre-event images available for track {track}')
-                break
-            
-            # add dates to process list, if not already there
-            # we take care of the two images needed before the start date
-            [to_process_list.append(date) for date in datelist[idx-2:idx+1] if date not in to_process_list]
-    
-            # once we added the last image after the the end of the event we can stop
-            if date >= event_end:
-                break
-        
-            if len(to_process_list) < 3:
-                output.add_live_msg(f' Not enough images available for track {track}')
-                break
-
-        # turn the dates back to strings so we can use to filter the data inventory
-        final_dates = [dt.strftime(date, '%Y%m%d') for date in to_process_list]
-        final_df = df[df.acquisitiondate.isin(final_dates)]
-        
-        output.add_live_msg(
-            " Downloading relevant Sentinel-1 SLC scenes ... (this may take a while)"
-        )
-        s1_slc.download(
-            final_df,
-            mirror=2,
-            concurrent=10,
-            uname=s1_slc.asf_uname,
-            pword=s1_slc.asf_pword,
-        )
-        
-        output.add_live_msg(" Create burst inventory")
-        s1_slc.create_burst_inventory(final_df)
-
-        # setting ARD parameters
-        output.add_live_msg(" Setting processing parameters")
-        s1_slc.ard_parameters["single_ARD"]["resolution"] = 30  # in metres
-        s1_slc.ard_parameters["single_ARD"]["create_ls_mask"] = False
-        s1_slc.ard_parameters["single_ARD"]["backscatter"] = False
-        s1_slc.ard_parameters["single_ARD"]["coherence"] = True
-        s1_slc.ard_parameters["single_ARD"]["coherence_bands"] = "VV"  # 'VV, VH'
-
-        # production of polarimetric layers
-        s1_slc.ard_parameters["single_ARD"][
-            "H-A-Alpha"
-        ] = False  # does not give a lot of additional information
-
-        # resampling of image (not so important)
-        s1_slc.ard_parameters['single_ARD']['dem']['dem_name'] = "SRTM 1Sec HGT"
-        s1_slc.ard_parameters['single_ARD']['dem']['image_resampling'] = 'BILINEAR_INTERPOLATION'  # 'BILINEAR_INTERPOLATION'
-
-        # multi-temporal speckle filtering is quite effective
-        s1_slc.ard_parameters['time-series_ARD']['mt_speckle_filter']['filter'] = 'Boxcar'
-        s1_slc.ard_parameters['time-series_ARD']['remove_mt_speckle'] = True
-        s1_slc.ard_parameters['time-scan_ARD']['metrics'] = ['min', 'max']
-        s1_slc.ard_parameters['time-scan_ARD']['remove_outliers'] = False
-        s1_slc.ard_parameters['mosaic']['cut_to_aoi'] = True
-
-        # set number of parallel processing 
-        workers = int(4) if os.cpu_count() / 4 > 4 else int(os.cpu_count() / 4)
-        output.add_live_msg(f" Processing {workers} bursts in parallel.")
-        s1_slc.config_dict["max_workers"] = workers
-        s1_slc.config_dict["executor_type"] = "concurrent_processes"
-        
-        # set tmp_dir
-        s1_slc.config_dict['temp_dir'] = '/ram'
-        
-        # pre-download SRTM
-        srtm.download_srtm(s1_slc.aoi)
-        
-        # process
-        output.add_live_msg(" Processing scenes... (this may take a while)")
-        s1_slc.bursts_to_ards(
-            timeseries=True, 
-            timescan=True, 
-            mosaic=False,
-            overwrite=False # TO BE CHAGNED
-        )
-        
-        
-        output.add_live_msg(" Calculate coherent change for each burst")
-        bursts = list(s1_slc.processing_dir.glob(f'[A,D]*{track}*'))
-        
-        for burst in bursts:
-            
-            # get track
-            track_name = burst.name[:4]
-
-            # in and out files
-            coh_min = burst.joinpath('Timescan/01.coh.VV.min.tif')
-            coh_max = burst.joinpath('Timescan/02.coh.VV.max.tif')
-            dstnt_file = burst.joinpath(f"Timescan/ccd_{burst.name}.tif")
-            
-            with rio.open(coh_max) as pre_coh:
-                pre_arr = pre_coh.read()
-                
-                # get metadata for destination file
-                meta = pre_coh.meta
-                meta.update(dtype='uint8', nodata=0)
-            
-                with rio.open(coh_min) as post_coh:
-                    post_arr = post_coh.read()
-
-                    # calulate difference
-                    coh_diff = np.subtract(pre_arr, post_arr)
-                    coh_diff[coh_diff < 0.27] = 0
-                    coh_diff = coh_diff * 100
- 
-                    with rio.open(dstnt_file, 'w', **meta) as dstnt:
-                        dstnt.write(coh_diff.astype('uint8'))  
-            
-        # -----------------------------------------
-        # and merge the result
-        src_files_to_mosaic = []
-        for file in s1_slc.processing_dir.glob(f"*[A,D]*{track}_*/Timescan/ccd*tif"):
-            src = rio.open(file)
-            src_files_to_mosaic.append(src)
-
-
-        mosaic, out_trans = merge(src_files_to_mosaic)
-        out_meta = src.profile.copy()
-
-        # Update the metadata
-        out_meta.update(
-            driver='GTiff',
-            height=mosaic.shape[1],
-            width= mosaic.shape[2],
-            transform=out_trans,
-            crs=src.crs,
-            tiled=True,
-            blockxsize=128,
-            blockysize=128,
-            compress='lzw'
+
+def search_inventory(s1_slc, search_start, search_end, manifest, output):
+    """
+    Search the SLC inventory of the project and keep the products available on ASF.
+
+    The search and the availability check are not manifest stages: they run every
+    time as the hub and ASF can publish new products for the same dates, their own
+    caches already avoid querying again what is known.
+    """
+
+    output.add_live_msg(" Searching for data")
+    base_url = "https://scihub.copernicus.eu/dhus/"
+    with manifest.tracer.span("search"):
+        inventory_file = cached_search(s1_slc, search_start, search_end, base_url)
+
+    # no acquisition over the aoi, the plan of an empty inventory is empty
+    if inventory_file is None:
+        columns = ["identifier", "relativeorbit", "acquisitiondate", "geometry"]
+        s1_slc.inventory = gpd.GeoDataFrame(columns=columns, geometry="geometry")
+        return
+
+    s1_slc.read_inventory()
+
+    # make sure all products are on ASF
+    output.add_live_msg(" Checking the availability of the data on ASF")
+    with manifest.tracer.span("availability"):
+        status = check_products_on_asf(
+            s1_slc.inventory.identifier, s1_slc.asf_uname, s1_slc.asf_pword
         )
+    available = [id_ for id_, code in status.items() if code == 200]
+    s1_slc.inventory = s1_slc.inventory[s1_slc.inventory.identifier.isin(available)]
+
+    return
 
-        tmp_dir = Path(s1_slc.config_dict['temp_dir'])
-        tmp_mrg = tmp_dir.joinpath(f"ccd_{track_name}.tif")
-        with rio.open(tmp_mrg, "w", **out_meta) as dest:
-            dest.write(mosaic)
 
-        # close datasets
-        [src.close for src in src_files_to_mosaic]
+def set_ard_parameters(s1_slc):
+    """set the ARD parameters of the coherence timescan and return the number of workers"""
+
+    s1_slc.ard_parameters["single_ARD"]["resolution"] = 30  # in metres
+    s1_slc.ard_parameters["single_ARD"]["create_ls_mask"] = False
+    s1_slc.ard_parameters["single_ARD"]["backscatter"] = False
+    s1_slc.ard_parameters["single_ARD"]["coherence"] = True
+    s1_slc.ard_parameters["single_ARD"]["coherence_bands"] = "VV"  # 'VV, VH'
+
+    # production of polarimetric layers
+    s1_slc.ard_parameters["single_ARD"][
+        "H-A-Alpha"
+    ] = False  # does not give a lot of additional information
+
+    # resampling of image (not so important)
+    s1_slc.ard_parameters["single_ARD"]["dem"]["dem_name"] = "SRTM 1Sec HGT"
+    s1_slc.ard_parameters["single_ARD"]["dem"][
+        "image_resampling"
+    ] = "BILINEAR_INTERPOLATION"  # 'BILINEAR_INTERPOLATION'
+
+    # multi-temporal speckle filtering is quite effective
+    s1_slc.ard_parameters["time-series_ARD"]["mt_speckle_filter"]["filter"] = "Boxcar"
+    s1_slc.ard_parameters["time-series_ARD"]["remove_mt_speckle"] = True
+    s1_slc.ard_parameters["time-scan_ARD"]["metrics"] = ["min", "max"]
+    s1_slc.ard_parameters["time-scan_ARD"]["remove_outliers"] = False
+    s1_slc.ard_parameters["mosaic"]["cut_to_aoi"] = True
+
+    # set number of parallel processing, the workers are shared by the tracks
+    # that are in their ARD phase at the same time
+    workers = max(1, get_workers() // pm.track_cpu_slots)
+    s1_slc.config_dict["max_workers"] = workers
+    s1_slc.config_dict["executor_type"] = "concurrent_processes"
+
+    return workers
+
+
+def process_track(
+    s1_slc,
+    track,
+    dates,
+    aoi_model,
+    project_dir,
+    output,
+    scheduler,
+    manifest,
+    zones_file=None,
+):
+    """
+    Create the damage proxy map of a single track from the selected dates.
+
+    The track works on its own copy of the OST project so that several tracks
+    can run at the same time, its phases are scheduled by the TrackScheduler.
+    Every stage is recorded in the manifest and skipped if it is up to date.
+    """
+
+    ccd_files = ard_track(s1_slc, track, dates, output, scheduler, manifest)
+
+    dpm_out_dir = project_dir / "Damage_Proxy_Maps"
+    export_track(
+        ccd_files,
+        track,
+        aoi_model.gdf,
+        dpm_out_dir,
+        output,
+        scheduler,
+        manifest,
+        zones_file=zones_file,
+    )
 
-        # crop to aoi (some ost routine)
-        shapes_ = [row.geometry for _, row in aoi_model.gdf.iterrows()]
+    return
 
-        with rio.open(tmp_mrg) as src:
-            out_image, out_transform = rio.mask.mask(src, shapes_, crop=True)
-            out_meta = src.profile
 
-        out_meta.update(
-            {
-                "driver": "GTiff",
-                "height": out_image.shape[1],
-                "width": out_image.shape[2],
-                "transform": out_transform,
-            }
+def ard_track(
+    s1_slc,
+    track,
+    dates,
+    output,
+    scheduler,
+    manifest,
+    key=None,
+    keep_downloads=False,
+    timescan=True,
+):
+    """
+    Download and process the SLC of a track up to the CCD of each of its bursts.
+
+    The stages are recorded in the manifest under the key (default to the track),
+    the storage intense files are removed once the CCD are computed. Return the
+    CCD files of the bursts. Without timescan the processing stops at the
+    coherence timeseries, which are kept and returned instead.
+    """
+
+    key = key or track
+
+    # use an independent copy of the project for this track
+    s1_slc = copy(s1_slc)
+    s1_slc.config_dict = deepcopy(s1_slc.config_dict)
+    s1_slc.ard_parameters = deepcopy(s1_slc.ard_parameters)
+
+    # filter by track and dates
+    inventory = s1_slc.inventory
+    final_df = inventory[
+        (inventory.relativeorbit == track) & inventory.acquisitiondate.isin(dates)
+    ]
+
+    identifiers = sorted(final_df.identifier)
+    # the bursts processed depend on the aoi they are pruned to
+    ard_params = {
+        "identifiers": identifiers,
+        "ard": s1_slc.ard_parameters,
+        "aoi": s1_slc.aoi,
+        "buffer": pm.aoi_buffer,
+        "timescan": timescan,
+    }
+    workers = s1_slc.config_dict["max_workers"]
+
+    single_ard = s1_slc.ard_parameters["single_ARD"]
+
+    def download_scenes(df):
+        download_dir = Path(s1_slc.download_dir)
+
+        # only the scenes that are not in the cache are downloaded
+        missing = product_cache.restore_slcs(sorted(df.identifier), download_dir)
+        if missing:
+            s1_slc.download(
+                df[df.identifier.isin(missing)],
+                mirror=2,
+                concurrent=10,
+                uname=s1_slc.asf_uname,
+                pword=s1_slc.asf_pword,
+            )
+            product_cache.store_slcs(missing, download_dir)
+            product_cache.evict()
+
+        return [f for id_ in df.identifier for f in download_dir.glob(f"**/{id_}.zip")]
+
+    def process_bursts(df, name, timeseries=True):
+        with manifest.tracer.span(f"burst_inventory_{name}"):
+            s1_slc.create_burst_inventory(
+                df,
+                outfile=s1_slc.inventory_dir.joinpath(f"bursts_{name}.gpkg"),
+            )
+
+        # only the bursts that intersect the aoi are processed
+        bursts_gdf = s1_slc.burst_inventory
+        aoi = aoi_geometry(s1_slc.aoi, bursts_gdf.crs)
+        s1_slc.burst_inventory = prune_bursts(bursts_gdf, aoi)
+        output.append_msg(
+            f" {s1_slc.burst_inventory.bid.nunique()}/{bursts_gdf.bid.nunique()} "
+            f"bursts of {name} intersect the AOI"
         )
 
-        # create final output directory
-        dpm_out_dir = project_dir / f"Damage_Proxy_Maps"
-        dpm_out_dir.mkdir(parents=True, exist_ok=True)
-        out_ds_tif = dpm_out_dir / f"ccd_{track_name}.tif"
-        with rio.open(out_ds_tif, "w", **out_meta) as dest:
-            dest.write(out_image)
-
-        # delete tmpmerge
-        tmp_mrg.unlink()
-        # -----------------------------------------
-
-        # -----------------------------------------
-        # kmz and dmp output
-        # write a color file to tmp
-        ctfile = tmp_dir.joinpath("colourtable.txt")
-        f = open(ctfile, "w")
-        ct = [
-            "0 0 0 0 0\n"
-            "27 253 246 50 255\n"
-            "35 253 169 50 255\n"
-            "43 253 100 50 255\n"
-            "51 253 50 50 255\n"
-            "59 255 10 10 255\n"
-            "255 253 0 0 255"
-        ]
-        f.writelines(ct)
-        f.close()
-
-        out_dpm_tif = dpm_out_dir / f"dpm_{track_name}.tif"
-        demopts = gdal.DEMProcessingOptions(
-            colorFilename=str(ctfile), addAlpha=True
-        )
-        gdal.DEMProcessing(
-            str(out_dpm_tif), str(out_ds_tif), "color-relief", options=demopts
+        # the acquisitions already processed for another event are not recomputed
+        bids = s1_slc.burst_inventory.bid.unique()
+        product_cache.restore_ards(bids, dates, single_ard, s1_slc.processing_dir)
+
+        # the temporary files go to the fastest storage tier with room for them
+        tmp_size = workers * pm.burst_tmp * 1024**3
+        with tmp_storage.place(tmp_size, f"ard_{name}") as tmp_dir:
+            output.append_msg(f" Temporary files of {name} in {tmp_dir.parent}")
+            s1_slc.config_dict["temp_dir"] = str(tmp_dir)
+            s1_slc.bursts_to_ards(
+                timeseries=timeseries,
+                timescan=timeseries and timescan,
+                mosaic=False,
+                overwrite=False,
+            )
+        bursts = [s1_slc.processing_dir / bid for bid in bids]
+        product_cache.store_ards(bursts, dates, single_ard)
+        product_cache.evict()
+
+    def download_date(date):
+        with scheduler.io_phase(), manifest.tracer.span(f"download_{key}_{date}"):
+            download_scenes(final_df[final_df.acquisitiondate == date])
+
+    def process_pair(date, partner):
+        pair_df = final_df[final_df.acquisitiondate.isin([date, partner])]
+        with scheduler.cpu_phase(), manifest.tracer.span(f"ard_{key}_{date}"):
+            process_bursts(pair_df, f"{key}_{date}", timeseries=False)
+
+    def ard():
+        # the single date ARD are computed while the next scenes are downloaded
+        if pm.ard_pipeline:
+            pipelined_ard(dates, download_date, process_pair)
+
+        with scheduler.cpu_phase():
+            process_bursts(final_df, key)
+
+        if not timescan:
+            return list(
+                s1_slc.processing_dir.glob(f"[A,D]{track}_*/Timeseries/*.coh.VV.tif")
+            )
+
+        return list(
+            s1_slc.processing_dir.glob(f"[A,D]{track}_*/Timescan/0[12].coh.VV.m*.tif")
         )
 
-        opts = gdal.TranslateOptions(
-            format="KMLSUPEROVERLAY", creationOptions=["format=png"]
-        )
-        gdal.Translate(
-            str(out_dpm_tif.with_suffix(".kmz")), str(out_dpm_tif), options=opts
-        )
+    # the downloads are only needed if the ARD products have to be recomputed
+    if not manifest.is_done(f"ard_{key}", params=ard_params):
 
-        ### adding legend like this to KMZ
-        # added = [
-        #    "\t\t<ScreenOverlay>\n",
-        #    "\t\t\t<name>\n",
-        #    "Legend: Damage Proxy Map\n",
-        #    "\t\t\t</name>\n",
-        #    "\t\t\t<Icon>\n",
-        #    "\t\t\t\t<href>https://raw.githubusercontent.com/12rambau/damage_proxy_map/refactoring/component/message/legend.png</href>\n",
-        #    "\t\t\t</Icon>\n",
-        #    '\t\t\t<overlayXY x="0.98" y="0.14" xunits="fraction" yunits="fraction"/>\n',
-        #    '\t\t\t<screenXY x="0.98" y="0.14" xunits="fraction" yunits="fraction"/>\n',
-        #    '\t\t\t<rotationXY x="0.5" y="0.5" xunits="fraction" yunits="fraction"/>\n',
-        #    '\t\t\t<size x="0.1" y="0.18" xunits="fraction" yunits="fraction"/>\n',
-        #    "\t\t</ScreenOverlay>\n",
-        #    "\t</Document>\n",
-        #    "</kml>\n"
-        # ]
-        # tmpzip = tmp_dir.joinpath('zipped')
-        # tmpzip.mkdir(parents=True, exist_ok=True)
-        #
-        # with ZipFile(out_dmp_tif.with_suffix('.kmz')) as zip_ref:
-        #    zip_ref.extractall(tmpzip)
-        #    with open(tmpzip.joinpath('doc.kml')) as f:
-        #
-        #        lines = f.readlines()
-        #        lines = lines[:-2]
-        #        lines.extend(added)
-        #
-        #    with open(tmpzip.joinpath('doc.kml'), 'w') as f:
-        #        for ele in lines:
-        #            f.write(ele)
-        #
-        # with ZipFile(out_dmp_tif.with_suffix('.kmz'), 'w') as zip_ref:
-        #    # Iterate over all the files in directory
-        #    for folderName, subfolders, filenames in os.walk(tmpzip):
-        #        for filename in filenames:
-        #           #create complete filepath of file in directory
-        #           filePath = os.path.join(folderName, filename)
-        #           # Add file to zip
-        #           zip_ref.write(filePath, os.path.join('/0/0/', os.path.basename(filePath)))
-        #        # -----------------------------------------
-
-        # -----------------------------------------
-        # polygonize (to points)
-        with rio.open(out_ds_tif) as src:
-            image = src.read()
-            mask = image != 0
-
-            geoms = [
-                {"properties": {"raster_val": v}, "geometry": s}
-                for i, (s, v) in enumerate(
-                    shapes(image, mask=mask, transform=src.transform)
+        # keep the disk space of the track reserved until its files are removed
+        disk_size = scheduler.reserve_disk(len(final_df) * pm.slc_disk_size * 1024**3)
+        try:
+            if not pm.ard_pipeline:
+                output.add_live_msg(
+                    f" Downloading relevant Sentinel-1 SLC scenes for track {track} ... (this may take a while)"
                 )
-            ]
-
-        # geoms = list(results)
-        gpd_polygonized_raster = gpd.GeoDataFrame.from_features(geoms)
-        gpd_polygonized_raster["geometry"] = gpd_polygonized_raster[
-            "geometry"
-        ].centroid
-        gpd_polygonized_raster.to_file(
-            out_dpm_tif.with_suffix(".geojson"), driver="GeoJSON"
+                with scheduler.io_phase():
+                    manifest.run(
+                        f"download_{key}",
+                        lambda: download_scenes(final_df),
+                        params={"identifiers": identifiers},
+                    )
+
+            output.add_live_msg(
+                f" Processing scenes of track {track}... (this may take a while)"
+            )
+            manifest.run(f"ard_{key}", ard, params=ard_params)
+
+        finally:
+            scheduler.release_disk(disk_size)
+
+    coh_files = manifest.outputs(f"ard_{key}")
+    bursts = sorted({f.parent.parent for f in coh_files})
+
+    def ccd():
+        aoi = aoi_geometry(s1_slc.aoi, buffer=pm.aoi_buffer)
+        errors = ccd_bursts(bursts, workers, aoi, threshold=pm.ccd_threshold)
+        for burst_name, error in errors.items():
+            output.add_live_msg(
+                f" Coherent change failed for burst {burst_name}: {error}",
+                "warning",
+            )
+
+        # the failed bursts are kept as missing outputs to be computed again
+        return [b.joinpath(f"Timescan/ccd_{b.name}.tif") for b in bursts]
+
+    if not timescan:
+        ccd_files = coh_files
+    else:
+        output.add_live_msg(
+            f" Calculate coherent change for each burst of track {track}"
         )
-
-        # remove storage intense files
+        with scheduler.cpu_phase():
+            ccd_files = manifest.run(
+                f"ccd_{key}",
+                ccd,
+                inputs=coh_files,
+                params={
+                    "threshold": pm.ccd_threshold,
+                    "aoi": s1_slc.aoi,
+                    "buffer": pm.aoi_buffer,
+                },
+            )
+
+    # remove the storage intense files of this track from the project, the SLC
+    # and single date ARD are retained in the product cache and the timescan
+    # products are kept to resume the pipeline from the CCD stage
+    with manifest.tracer.span(f"cleanup_{key}"):
         try:
-            [file.unlink() for file in Path(s1_slc.download_dir).glob("**/*zip")]
-            [
-                file.unlink()
-                for file in Path(s1_slc.download_dir).glob("**/*downloaded")
-            ]
-            [file.unlink() for file in Path(s1_slc.processing_dir).glob("**/*img")]
-            [file.unlink() for file in Path(s1_slc.processing_dir).glob("**/*tif")]
-            [
-                file.unlink()
-                for file in Path(s1_slc.processing_dir).glob("**/*processed")
-            ]
+            for identifier in [] if keep_downloads else identifiers:
+                [
+                    file.unlink()
+                    for file in Path(s1_slc.download_dir).glob(f"**/{identifier}*")
+                ]
+            for burst in bursts:
+                [file.unlink() for file in burst.glob("**/*img")]
+                [
+                    file.unlink()
+                    for file in burst.glob("**/*tif")
+                    if file.parent.name != "Timescan"
+                    and (timescan or file.parent.name != "Timeseries")
+                ]
+                [file.unlink() for file in burst.glob("**/*processed")]
 
         except:
             pass
-        # -----------------------------------------
 
-    try:
-        shutil.rmtree(s1_slc.download_dir)
-        shutil.rmtree(s1_slc.processing_dir)
-    except:
-        pass
+    return ccd_files
+
+
+def export_track(
+    ccd_files,
+    track,
+    aoi_gdf,
+    dpm_out_dir,
+    output,
+    scheduler,
+    manifest,
+    zones_file=None,
+):
+    """
+    Mosaic the burst CCD of a track over the AOI and export the damage proxy map.
+
+    The outputs are written in the dpm_out_dir and their stages recorded in the
+    manifest. The damage statistics are computed for the features of the
+    zones_file if provided, of the AOI otherwise.
+    """
+
+    # get track
+    track_name = ccd_files[0].parent.parent.name[:4]
+    aoi = aoi_gdf.dissolve().geometry.to_wkt().values[0]
+
+    # create final output directory
+    dpm_out_dir.mkdir(parents=True, exist_ok=True)
+    out_ds_tif = dpm_out_dir / f"ccd_{track_name}.tif"
+    out_dpm_tif = dpm_out_dir / f"dpm_{track_name}.tif"
+
+    # merge the result, crop it to the aoi and colour it in a single pass
+    output.add_live_msg(f" Mosaic and colour the coherent change of track {track}")
+    ccd_files = [f for f in ccd_files if f.is_file()]
+    manifest.run(
+        f"mosaic_{track}",
+        lambda: [
+            to_cog(
+                mosaic_to_aoi(
+                    ccd_files, out_ds_tif, aoi_gdf=aoi_gdf, dpm_file=out_dpm_tif
+                )
+            ),
+            to_cog(out_dpm_tif),
+        ],
+        inputs=ccd_files,
+        params={
+            "aoi": aoi,
+            "cog": pm.cog_options,
+            "breakpoints": pm.colour_breakpoints,
+            "ramp": pm.colour_ramp,
+        },
+    )
+
+    # web tiles, the cpu slot covers the tile encoding pool
+    output.add_live_msg(f" Render the web tiles of track {track}")
+    out_mbtiles = out_dpm_tif.with_suffix(".mbtiles")
+    with scheduler.cpu_phase():
+        manifest.run(
+            f"tiles_{track}",
+            lambda: [export_tiles(out_dpm_tif, out_mbtiles, cpu_limit())],
+            inputs=[out_dpm_tif],
+            params={"size": pm.tile_size, "levels": pm.tiles_zoom_levels},
+        )
+
+    output.add_live_msg(f" Export the KMZ of track {track}")
+    out_kmz = out_dpm_tif.with_suffix(".kmz")
+    with scheduler.io_phase():
+        if pm.kmz_from_tiles:
+            manifest.run(
+                f"kmz_{track}",
+                lambda: [tiles_to_kmz(out_mbtiles, out_kmz)],
+                inputs=[out_mbtiles],
+                params={"from_tiles": True},
+            )
+        else:
+            manifest.run(
+                f"kmz_{track}",
+                lambda: [export_kmz(out_dpm_tif, out_kmz)],
+                inputs=[out_dpm_tif],
+                params={"from_tiles": False},
+            )
+
+    # damaged pixels to points
+    output.add_live_msg(f" Export the damaged points of track {track}")
+    manifest.run(
+        f"points_{track}",
+        lambda: [
+            export_points(out_ds_tif, out_dpm_tif.with_suffix(suffix))
+            for suffix in pm.points_formats
+        ],
+        inputs=[out_ds_tif],
+        params={"formats": pm.points_formats},
+    )
+
+    # one centroid per cluster of connected damaged pixels
+    output.add_live_msg(f" Export the damage clusters of track {track}")
+    manifest.run(
+        f"clusters_{track}",
+        lambda: [
+            export_clusters(out_ds_tif, dpm_out_dir / f"clusters_{track_name}{suffix}")
+            for suffix in pm.points_formats
+        ],
+        inputs=[out_ds_tif],
+        params={
+            "formats": pm.points_formats,
+            "min_pixels": pm.cluster_min_pixels,
+            "percentile": pm.cluster_percentile,
+            "block_size": pm.block_size,
+        },
+    )
+
+    # damage statistics of the zones
+    output.add_live_msg(f" Compute the damage statistics of the zones of track {track}")
+
+    def zonal():
+        zones_gdf = gpd.read_file(zones_file) if zones_file else aoi_gdf
+        out_csv = dpm_out_dir / f"zonal_{track_name}.csv"
+        return [export_zonal_stats(out_ds_tif, zones_gdf, out_csv)]
+
+    manifest.run(
+        f"zonal_{track}",
+        zonal,
+        inputs=[out_ds_tif, *([Path(zones_file)] if zones_file else [])],
+        params={
+            "zones": str(zones_file) if zones_file else aoi,
+            "bins": pm.colour_breakpoints,
+        },
+    )
 
     return
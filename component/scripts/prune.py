@@ -0,0 +1,44 @@
+import geopandas as gpd
+import numpy as np
+from shapely import wkt
+from shapely.strtree import STRtree
+
+from component import parameter as pm
+
+
+def aoi_geometry(aoi, crs="EPSG:4326", buffer=None):
+    """
+    The AOI as a single geometry in the crs, buffered by buffer metres.
+
+    Args:
+        aoi: the AOI as a WKT in EPSG:4326
+        buffer: default to pm.aoi_buffer
+    """
+
+    buffer = pm.aoi_buffer if buffer is None else buffer
+    aoi = gpd.GeoSeries([wkt.loads(aoi)], crs="EPSG:4326")
+
+    # buffer in a metric projection
+    if buffer:
+        utm = aoi.estimate_utm_crs()
+        aoi = aoi.to_crs(utm).buffer(buffer)
+
+    return aoi.to_crs(crs).iloc[0]
+
+
+def prune_bursts(burst_gdf, aoi):
+    """
+    Keep the bursts that intersect the AOI geometry.
+
+    The footprints are indexed in a STRtree so that only the bursts whose bounding
+    box intersect the AOI are tested against its actual geometry.
+
+    Args:
+        burst_gdf: the OST burst inventory
+        aoi: the AOI geometry in the CRS of the burst inventory
+    """
+
+    tree = STRtree(burst_gdf.geometry.values)
+    index = tree.query(aoi, predicate="intersects")
+
+    return burst_gdf.iloc[np.sort(index)]
@@ -0,0 +1,87 @@
+import os
+import re
+from pathlib import Path
+
+from component import parameter as pm
+
+from .storage import tmp_storage
+
+cgroup_dir = Path("/sys/fs/cgroup")
+
+
+def _read(file):
+    """read a single value file, None if it doesn't exist"""
+
+    try:
+        return (cgroup_dir / file).read_text().strip()
+    except OSError:
+        return None
+
+
+def cpu_limit():
+    """number of CPUs usable by the app: affinity and cgroup quota (v1 and v2)"""
+
+    cpus = len(os.sched_getaffinity(0))
+
+    # cgroup v2
+    cpu_max = _read("cpu.max")
+    if cpu_max and not cpu_max.startswith("max"):
+        quota, period = cpu_max.split()
+        cpus = min(cpus, int(quota) / int(period))
+
+    # cgroup v1
+    quota, period = _read("cpu/cpu.cfs_quota_us"), _read("cpu/cpu.cfs_period_us")
+    if quota and period and int(quota) > 0:
+        cpus = min(cpus, int(quota) / int(period))
+
+    return max(1, int(cpus))
+
+
+def memory_limit():
+    """memory usable by the app in bytes: physical memory and cgroup limit (v1 and v2)"""
+
+    with open("/proc/meminfo") as f:
+        matched = re.search(r"^MemTotal:\s+(\d+)", f.read())
+    memory = int(matched.groups()[0]) * 1024
+
+    # cgroup v2, then v1 (unlimited v1 groups report a huge value)
+    for file in ["memory.max", "memory/memory.limit_in_bytes"]:
+        limit = _read(file)
+        if limit and limit.isdigit():
+            memory = min(memory, int(limit))
+
+    return memory
+
+
+def get_workers():
+    """
+    Number of bursts that can be processed in parallel on this computer.
+
+    Each burst needs pm.burst_cpus CPUs, pm.burst_memory GB of memory and
+    pm.burst_tmp GB on a temporary storage tier, the limits of the container are
+    used instead of the host ones. As the placements spill to the slowest tier,
+    only the largest tier (usually the result disk) bounds the workers, the size
+    of the faster ones (e.g. the /ram tmpfs) only decides where the files go.
+    """
+
+    gb = 1024**3
+    workers = min(
+        cpu_limit() // pm.burst_cpus,
+        memory_limit() // (pm.burst_memory * gb),
+        tmp_storage.largest_free() // (pm.burst_tmp * gb),
+    )
+
+    return max(1, int(workers))
+
+
+def check_computer_size():
+    """check if the computer size will match the reuirements of the app"""
+
+    # we check if available ram and cpus are enough for one burst at least
+    gb = 1024**3
+    if cpu_limit() < pm.burst_cpus or memory_limit() < pm.burst_memory * gb:
+        raise Exception(
+            f"WARNING: You should run this notebook with an instance of at least {pm.burst_memory}Gb of Ram and {pm.burst_cpus} CPUs."
+        )
+
+    return
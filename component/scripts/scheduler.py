@@ -0,0 +1,80 @@
+import shutil
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import contextmanager
+
+
+class TrackScheduler:
+    """
+    Run independent tracks concurrently under a global resource budget.
+
+    Every track runs in its own thread and wraps its phases in the context
+    managers of the scheduler: the CPU bound phases (ARD, CCD) share a limited
+    number of slots, the I/O bound phases (download, exports) share another one
+    and the downloads reserve disk space on the project disk before starting.
+    This way the download of one track overlaps with the ARD of another one
+    without oversubscribing the computer.
+    """
+
+    def __init__(self, disk_dir, cpu_slots=1, io_slots=2):
+
+        self._cpu = threading.BoundedSemaphore(cpu_slots)
+        self._io = threading.BoundedSemaphore(io_slots)
+        self._disk = threading.Condition()
+        self._disk_budget = shutil.disk_usage(disk_dir).free
+        self._reserved = 0
+
+    @contextmanager
+    def cpu_phase(self):
+        """hold one of the CPU slots"""
+
+        with self._cpu:
+            yield
+
+    @contextmanager
+    def io_phase(self):
+        """hold one of the I/O slots"""
+
+        with self._io:
+            yield
+
+    def reserve_disk(self, size):
+        """
+        Wait until size bytes of the project disk budget are free and reserve them.
+
+        If nothing is reserved the request is always granted, so that a track larger
+        than the disk still gets a chance to run alone.
+        """
+
+        with self._disk:
+            while self._reserved and self._disk_budget - self._reserved < size:
+                self._disk.wait()
+            self._reserved += size
+
+        return size
+
+    def release_disk(self, size):
+        """give back disk space reserved with reserve_disk"""
+
+        with self._disk:
+            self._reserved = max(0, self._reserved - size)
+            self._disk.notify_all()
+
+    def run(self, tracks, func):
+        """
+        Run func(track) for every track concurrently.
+
+        A failing track doesn't stop the others, the errors are collected and
+        returned as a dict of {track: error message}.
+        """
+
+        errors = {}
+        with ThreadPoolExecutor(max_workers=max(1, len(tracks))) as executor:
+            futures = {executor.submit(func, track): track for track in tracks}
+            for future in as_completed(futures):
+                try:
+                    future.result()
+                except Exception as e:
+                    errors[futures[future]] = str(e)
+
+        return errors
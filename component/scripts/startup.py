@@ -0,0 +1,49 @@
+import json
+import time
+from datetime import datetime as dt
+
+from component import parameter as pm
+
+# the startup times of the app, one json record per line
+startup_file = pm.cache_dir / "startup.jsonl"
+
+
+def _record(event, seconds):
+    """append a startup time to the startup file"""
+
+    record = {
+        "date": dt.now().isoformat(),
+        "event": event,
+        "seconds": round(seconds, 3),
+    }
+    with startup_file.open("a") as f:
+        f.write(json.dumps(record) + "\n")
+
+    return
+
+
+def report_startup(start):
+    """
+    Record the time to interactive of the app.
+
+    Args:
+        start: the time.perf_counter() value at the beginning of the notebook
+    """
+
+    seconds = time.perf_counter() - start
+    _record("interactive", seconds)
+
+    return seconds
+
+
+def warm_up():
+    """
+    Start the job queue once the app is displayed.
+
+    Its worker process imports the processing modules in the background, the
+    kernel itself never loads them.
+    """
+
+    from .jobs import job_queue
+
+    return job_queue
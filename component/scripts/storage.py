@@ -0,0 +1,147 @@
+import os
+import shutil
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from uuid import uuid4
+
+from component import parameter as pm
+
+gb = 1024**3
+
+
+class TempStorage:
+    """
+    Placement of the temporary files on the storage tiers.
+
+    The tiers are ordered from the fastest to the slowest, each placement goes to
+    the fastest tier that has room for it once the space reserved by the other
+    placements and the headroom are deducted. The leftovers of interrupted runs
+    are evicted when no tier has room, and the placement spills to the slowest
+    tier if it still doesn't fit anywhere. The directories are named after the
+    process that owns them so that the placements of other processes (UI workers,
+    batch runs) are never evicted.
+    """
+
+    def __init__(self, tiers=pm.tmp_tiers, headroom=pm.tmp_headroom):
+
+        self.tiers = []
+        for i, tier in enumerate(tiers):
+            tier = Path(tier)
+
+            # the slowest tier is always available
+            if not tier.is_dir() and i < len(tiers) - 1:
+                continue
+
+            try:
+                tier.joinpath("process_tmp").mkdir(parents=True, exist_ok=True)
+                self.tiers.append(tier)
+            except OSError:
+                pass
+
+        self.headroom = headroom * gb
+        self._reserved = {tier: 0 for tier in self.tiers}
+        self._active = set()
+        self._lock = threading.Lock()
+
+    @property
+    def tmp_dir(self):
+        """the shared temporary directory on the fastest tier"""
+
+        return self.tiers[0] / "process_tmp"
+
+    def free(self, tier):
+        """free space of a tier that is not reserved by a placement"""
+
+        free = shutil.disk_usage(tier).free - self._reserved[tier] - self.headroom
+        return max(0, free)
+
+    def largest_free(self):
+        """the largest space that a placement can get"""
+
+        return max(self.free(tier) for tier in self.tiers)
+
+    def _owner_alive(self, dir_):
+        """whether the process that created a temporary directory is still running"""
+
+        try:
+            pid = int(dir_.name.rsplit("_", 2)[-2])
+        except ValueError:
+            return False
+
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            return False
+        except PermissionError:
+            pass
+
+        return True
+
+    def _evict(self):
+        """remove the temporary directories left by the processes that are gone"""
+
+        for tier in self.tiers:
+            for dir_ in tier.joinpath("process_tmp").glob("*_tmp_*"):
+                if dir_ not in self._active and not self._owner_alive(dir_):
+                    shutil.rmtree(dir_, ignore_errors=True)
+
+    def _select(self, size):
+        """the fastest tier with room for the size, None if it fits nowhere"""
+
+        return next((t for t in self.tiers if self.free(t) >= size), None)
+
+    @contextmanager
+    def place(self, size, name):
+        """
+        Yield a temporary directory with room for size bytes.
+
+        The space is reserved until the directory is removed at exit.
+        """
+
+        with self._lock:
+            tier = self._select(size)
+            if tier is None:
+                self._evict()
+                tier = self._select(size) or self.tiers[-1]
+
+            dir_name = f"{name}_tmp_{os.getpid()}_{uuid4().hex[:8]}"
+            dir_ = tier / "process_tmp" / dir_name
+            dir_.mkdir(parents=True)
+            self._reserved[tier] += size
+            self._active.add(dir_)
+
+        try:
+            yield dir_
+
+        finally:
+            shutil.rmtree(dir_, ignore_errors=True)
+            with self._lock:
+                self._reserved[tier] -= size
+                self._active.discard(dir_)
+
+    def usage(self):
+        """used, reserved and total space of each tier in GB"""
+
+        usage = {}
+        for tier in self.tiers:
+            disk = shutil.disk_usage(tier)
+            usage[str(tier)] = {
+                "used": round(disk.used / gb, 1),
+                "reserved": round(self._reserved[tier] / gb, 1),
+                "total": round(disk.total / gb, 1),
+            }
+
+        return usage
+
+    def report(self):
+        """human readable utilization of the tiers"""
+
+        return ", ".join(
+            f"{tier}: {u['used']}/{u['total']} GB used ({u['reserved']} GB reserved)"
+            for tier, u in self.usage().items()
+        )
+
+
+# the temporary storage of all the projects run in this kernel
+tmp_storage = TempStorage()
@@ -0,0 +1,255 @@
+import math
+import warnings
+import sqlite3
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import ExitStack, closing
+
+import numpy as np
+import rasterio as rio
+from rasterio.enums import Resampling
+from rasterio.errors import NotGeoreferencedWarning
+from rasterio.io import MemoryFile
+from rasterio.transform import from_bounds
+from rasterio.vrt import WarpedVRT
+from rasterio.warp import transform_bounds
+
+from component import parameter as pm
+
+# half of the web mercator world extent in metres
+origin = math.pi * 6378137
+max_lat = 85.0511
+
+
+def _tile_xy(lon, lat, zoom):
+    """tile coordinates of a lon/lat point"""
+
+    lat = math.radians(max(-max_lat, min(max_lat, lat)))
+    n = 2**zoom
+    x = int((lon + 180) / 360 * n)
+    y = int((1 - math.asinh(math.tan(lat)) / math.pi) / 2 * n)
+
+    return min(max(x, 0), n - 1), min(max(y, 0), n - 1)
+
+
+def _tile_lonlat_bounds(x, y, zoom):
+    """lon/lat bounds (west, south, east, north) of a tile"""
+
+    n = 2**zoom
+
+    def lat(y):
+        return math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * y / n))))
+
+    return x / n * 360 - 180, lat(y + 1), (x + 1) / n * 360 - 180, lat(y)
+
+
+def _tile_mercator_bounds(x, y, zoom):
+    """web mercator bounds (left, bottom, right, top) of a tile"""
+
+    size = 2 * origin / 2**zoom
+    left, top = -origin + x * size, origin - y * size
+
+    return left, top - size, left + size, top
+
+
+def _ground_res(src):
+    """size of the pixels in metres and latitude (radians) of the raster center"""
+
+    west, south, east, north = transform_bounds(src.crs, "EPSG:4326", *src.bounds)
+    lat = math.radians((south + north) / 2)
+
+    res = abs(src.res[0])
+    if src.crs.is_geographic:
+        res = res * math.pi / 180 * 6378137 * math.cos(lat)
+
+    return res, lat
+
+
+def _zoom_range(src):
+    """native zoom level of the raster and the one pm.tiles_zoom_levels above"""
+
+    res, lat = _ground_res(src)
+    max_zoom = math.ceil(math.log2(2 * origin * math.cos(lat) / pm.tile_size / res))
+
+    return max(0, max_zoom - pm.tiles_zoom_levels), max_zoom
+
+
+def _overview_level(src, zoom):
+    """
+    Index of the coarsest overview of the raster that is not coarser than the
+    tiles of the zoom level, -1 for the full resolution.
+    """
+
+    res, lat = _ground_res(src)
+    tile_res = 2 * origin * math.cos(lat) / 2**zoom / pm.tile_size
+
+    # the factors are rounded so that a level matching the tiles is used
+    factors = src.overviews(1)
+    return sum(round(f / (tile_res / res), 6) <= 1 for f in factors) - 1
+
+
+def _render_tiles(dpm_file, tiles):
+    """
+    Render a chunk of (zoom, x, y, overview level) tiles as PNG, the empty ones are
+    skipped.
+
+    The tiles are warped from the overview of their level so that the lower zoom
+    levels don't read the full resolution raster again.
+    """
+
+    # the PNG tiles are not georeferenced on purpose
+    warnings.filterwarnings("ignore", category=NotGeoreferencedWarning)
+
+    rendered = []
+    size = pm.tile_size
+    meta = {"driver": "PNG", "width": size, "height": size, "dtype": "uint8"}
+    with ExitStack() as stack:
+        srcs = {}
+        for zoom, x, y, level in tiles:
+
+            if level not in srcs:
+                kwargs = {"overview_level": level} if level >= 0 else {}
+                srcs[level] = stack.enter_context(rio.open(dpm_file, **kwargs))
+
+            # warp the source directly on the tile grid
+            bounds = _tile_mercator_bounds(x, y, zoom)
+            with WarpedVRT(
+                srcs[level],
+                crs="EPSG:3857",
+                transform=from_bounds(*bounds, size, size),
+                width=size,
+                height=size,
+                resampling=Resampling.nearest,
+            ) as vrt:
+                arr = vrt.read()
+
+            # skip the transparent tiles
+            if not arr[-1].any():
+                continue
+
+            with MemoryFile() as memfile:
+                with memfile.open(count=arr.shape[0], **meta) as png:
+                    png.write(arr)
+                rendered.append((zoom, x, y, memfile.read()))
+
+    return rendered
+
+
+def export_tiles(dpm_file, mbtiles_file, workers):
+    """
+    Render the coloured damage proxy map as a web tile pyramid in a MBTiles file.
+
+    The tiles of every zoom level from the native resolution up to
+    pm.tiles_zoom_levels levels above are PNG encoded in a pool of processes, the
+    transparent ones are not stored. The lower levels are read from the overviews
+    of the raster (the COG ones) when it has some.
+    """
+
+    with rio.open(dpm_file) as src:
+        min_zoom, max_zoom = _zoom_range(src)
+        bounds = transform_bounds(src.crs, "EPSG:4326", *src.bounds)
+        levels = {z: _overview_level(src, z) for z in range(min_zoom, max_zoom + 1)}
+
+    # all the tiles covering the raster
+    tiles = []
+    for zoom, level in levels.items():
+        xmin, ymin = _tile_xy(bounds[0], bounds[3], zoom)
+        xmax, ymax = _tile_xy(bounds[2], bounds[1], zoom)
+        tiles += [
+            (zoom, x, y, level)
+            for x in range(xmin, xmax + 1)
+            for y in range(ymin, ymax + 1)
+        ]
+
+    chunks = np.array_split(np.array(tiles), max(1, workers) * 4)
+    chunks = [c.tolist() for c in chunks if len(c)]
+
+    mbtiles_file.unlink(missing_ok=True)
+    # the connection context of sqlite3 only commits, it is closed explicitly
+    db = sqlite3.connect(mbtiles_file)
+    with closing(db), ProcessPoolExecutor(workers) as executor:
+        db.execute("CREATE TABLE metadata (name text, value text)")
+        db.execute(
+            "CREATE TABLE tiles (zoom_level integer, tile_column integer, "
+            "tile_row integer, tile_data blob)"
+        )
+        db.execute(
+            "CREATE UNIQUE INDEX tile_index on tiles (zoom_level, tile_column, tile_row)"
+        )
+        metadata = {
+            "name": dpm_file.stem,
+            "format": "png",
+            "type": "overlay",
+            "minzoom": min_zoom,
+            "maxzoom": max_zoom,
+            "bounds": ",".join(str(b) for b in bounds),
+        }
+        db.executemany("INSERT INTO metadata VALUES (?, ?)", metadata.items())
+
+        for rendered in executor.map(_render_tiles, [dpm_file] * len(chunks), chunks):
+            # MBTiles use the TMS row numbering
+            db.executemany(
+                "INSERT INTO tiles VALUES (?, ?, ?, ?)",
+                [(z, x, 2**z - 1 - y, data) for z, x, y, data in rendered],
+            )
+        db.commit()
+
+    return mbtiles_file
+
+
+def tiles_to_kmz(mbtiles_file, kmz_file):
+    """
+    Pack the web tiles of a MBTiles file as a region based KML super overlay.
+
+    Each tile is a ground overlay displayed by Google Earth only at its own level
+    of detail, the PNG are reused as they are.
+    """
+
+    overlay = (
+        "<GroundOverlay><name>{z}/{x}/{y}</name>"
+        "<Region><LatLonAltBox>{box}</LatLonAltBox>"
+        "<Lod><minLodPixels>{min_lod}</minLodPixels>"
+        "<maxLodPixels>{max_lod}</maxLodPixels></Lod></Region>"
+        "<Icon><href>{z}/{x}/{y}.png</href></Icon>"
+        "<LatLonBox>{box}</LatLonBox></GroundOverlay>\n"
+    )
+
+    with closing(sqlite3.connect(mbtiles_file)) as db:
+        metadata = dict(db.execute("SELECT name, value FROM metadata"))
+        min_zoom, max_zoom = int(metadata["minzoom"]), int(metadata["maxzoom"])
+
+        with zipfile.ZipFile(kmz_file, "w") as kmz:
+            overlays = []
+            tiles = db.execute(
+                "SELECT zoom_level, tile_column, tile_row, tile_data FROM tiles"
+            )
+            for z, x, row, data in tiles:
+                y = 2**z - 1 - row
+                kmz.writestr(f"{z}/{x}/{y}.png", data)
+
+                west, south, east, north = _tile_lonlat_bounds(x, y, z)
+                box = (
+                    f"<north>{north}</north><south>{south}</south>"
+                    f"<east>{east}</east><west>{west}</west>"
+                )
+                overlays.append(
+                    overlay.format(
+                        z=z,
+                        x=x,
+                        y=y,
+                        box=box,
+                        min_lod=0 if z == min_zoom else pm.tile_size / 2,
+                        max_lod=-1 if z == max_zoom else pm.tile_size * 2,
+                    )
+                )
+
+            doc = (
+                '<?xml version="1.0" encoding="UTF-8"?>\n'
+                '<kml xmlns="http://www.opengis.net/kml/2.2"><Document>\n'
+                f"<name>{metadata['name']}</name>\n"
+                + "".join(overlays)
+                + "</Document></kml>\n"
+            )
+            kmz.writestr("doc.kml", doc)
+
+    return kmz_file
@@ -0,0 +1,132 @@
+import json
+import os
+import resource
+import shutil
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+from component import parameter as pm
+
+
+def _proc(file, key):
+    """read a value of a /proc/self file, 0 if not available"""
+
+    try:
+        for line in Path("/proc/self", file).read_text().splitlines():
+            if line.startswith(f"{key}:"):
+                return int(line.split()[1])
+    except OSError:
+        pass
+
+    return 0
+
+
+def _tmpfs_used():
+    """used space on the ramdisk in bytes"""
+
+    return shutil.disk_usage(pm.ram_dir).used if Path(pm.ram_dir).is_dir() else 0
+
+
+class Tracer:
+    """
+    Instrumentation of the pipeline phases.
+
+    Every phase wrapped in span is recorded with its wall time, CPU time (of the
+    app and of its finished subprocesses), peak RSS (of the app or of its largest
+    finished subprocess, as the ARD, CCD and tiles pools run in subprocesses),
+    bytes read and written on disk and the ramdisk usage. The records can be
+    summarized for the UI and saved as a Chrome trace (chrome://tracing,
+    https://ui.perfetto.dev) for offline profiling.
+
+    The measures are process wide, when several tracks run at the same time they
+    include the work of the concurrent phases.
+    """
+
+    def __init__(self):
+
+        self.events = []
+        self._lock = threading.Lock()
+        self._active = 0
+        self._t0 = time.perf_counter()
+
+    def _reset_peak_rss(self):
+        """reset the peak RSS of the process, only possible on Linux"""
+
+        try:
+            Path("/proc/self/clear_refs").write_text("5")
+        except OSError:
+            pass
+
+    @contextmanager
+    def span(self, name, **args):
+        """record the execution of the wrapped phase"""
+
+        with self._lock:
+            if not self._active:
+                self._reset_peak_rss()
+            self._active += 1
+
+        start = time.perf_counter()
+        cpu = time.process_time()
+        children = resource.getrusage(resource.RUSAGE_CHILDREN)
+        read, written = _proc("io", "read_bytes"), _proc("io", "write_bytes")
+
+        try:
+            yield
+        finally:
+            end = time.perf_counter()
+            new_children = resource.getrusage(resource.RUSAGE_CHILDREN)
+            children_cpu = (new_children.ru_utime + new_children.ru_stime) - (
+                children.ru_utime + children.ru_stime
+            )
+
+            # ru_maxrss is in kB on Linux and only grows over the kernel life
+            peak_rss = _proc("status", "VmHWM")
+            children_rss = new_children.ru_maxrss
+            if children_rss <= children.ru_maxrss:
+                children_rss = 0
+
+            mb = 1024**2
+            args.update(
+                cpu_s=round(time.process_time() - cpu + children_cpu, 3),
+                peak_rss_mb=round(max(peak_rss, children_rss) / 1024, 1),
+                children_peak_rss_mb=round(children_rss / 1024, 1),
+                read_mb=round((_proc("io", "read_bytes") - read) / mb, 1),
+                written_mb=round((_proc("io", "write_bytes") - written) / mb, 1),
+                tmpfs_used_mb=round(_tmpfs_used() / mb, 1),
+            )
+            event = {
+                "name": name,
+                "ph": "X",
+                "ts": int((start - self._t0) * 1e6),
+                "dur": int((end - start) * 1e6),
+                "pid": os.getpid(),
+                "tid": threading.get_ident(),
+                "args": args,
+            }
+
+            with self._lock:
+                self._active -= 1
+                self.events.append(event)
+
+    def summary(self, top=5):
+        """short summary of the longest phases"""
+
+        events = sorted(self.events, key=lambda e: e["dur"], reverse=True)[:top]
+        lines = [
+            f"{e['name']}: {e['dur'] / 1e6:.1f} s, {e['args']['peak_rss_mb']} MB"
+            for e in events
+        ]
+
+        return "Longest steps: " + ", ".join(lines)
+
+    def save(self, file):
+        """save the records as a Chrome trace JSON file"""
+
+        with self._lock:
+            trace = {"traceEvents": self.events, "displayTimeUnit": "ms"}
+        Path(file).write_text(json.dumps(trace, indent=1, default=str))
+
+        return file
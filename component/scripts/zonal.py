@@ -0,0 +1,143 @@
+import numpy as np
+import pandas as pd
+import rasterio as rio
+import shapely
+from rasterio.features import rasterize
+from shapely.geometry import box
+
+from component import parameter as pm
+
+from .areas import pixel_areas
+
+
+def _polygons(geoms):
+    """
+    GeoJSON-like polygons of the parts of the geometries and the index of their
+    geometry.
+
+    The dicts are built from the coordinates arrays of shapely, which is much
+    faster for many small polygons than the __geo_interface__ of each of them.
+    The parts that are not polygons are dropped.
+    """
+
+    parts, index = shapely.get_parts(geoms, return_index=True)
+    polygons = shapely.get_type_id(parts) == 3
+    parts, index = parts[polygons], index[polygons]
+
+    if parts.size == 0:
+        return parts, [], index
+
+    _, coords, (ring_offsets, polygon_offsets) = shapely.to_ragged_array(parts)
+    points = list(zip(coords[:, 0].tolist(), coords[:, 1].tolist()))
+    ring_offsets, polygon_offsets = ring_offsets.tolist(), polygon_offsets.tolist()
+    rings = [points[s:e] for s, e in zip(ring_offsets, ring_offsets[1:])]
+    shapes = [
+        {"type": "Polygon", "coordinates": rings[s:e]}
+        for s, e in zip(polygon_offsets, polygon_offsets[1:])
+    ]
+
+    return parts, shapes, index
+
+
+def _bin_names(breakpoints):
+    """column names of the CCD histogram bins"""
+
+    return [f"ccd_{lo}_{hi}" for lo, hi in zip(breakpoints, breakpoints[1:])]
+
+
+def zonal_stats(ccd_file, zones_gdf):
+    """
+    Compute the damage statistics of each zone of a CCD raster.
+
+    The polygons of the zones are rasterized block by block to the CCD grid as an
+    integer label raster, only the ones whose bounds intersect the block are
+    burnt. The counts, areas and CCD histogram (bins between the
+    colour_breakpoints) of every zone are then reduced with a single bincount per
+    block so that the cost doesn't depend on the number of zones. A pixel covered
+    by overlapping zones counts for the last one. Return a DataFrame with a row per
+    zone.
+    """
+
+    breakpoints = np.array(pm.colour_breakpoints)
+    n_bins = len(breakpoints) - 1
+
+    with rio.open(ccd_file) as src:
+
+        geoms = np.asarray(zones_gdf.to_crs(src.crs).geometry.values)
+        parts, shapes, index = _polygons(geoms)
+        tree = shapely.STRtree(parts)
+        n_zones = len(geoms) + 1
+
+        totals = {
+            k: np.zeros(n_zones)
+            for k in ["pixels", "area", "damaged", "damaged_area", "ccd_sum"]
+        }
+        hist = np.zeros(n_zones * n_bins, dtype="int64")
+
+        for _, window in src.block_windows(1):
+
+            idx = np.sort(tree.query(box(*src.window_bounds(window))))
+            if idx.size == 0:
+                continue
+
+            labels = rasterize(
+                ((shapes[i], index[i] + 1) for i in idx.tolist()),
+                out_shape=(window.height, window.width),
+                transform=src.window_transform(window),
+                fill=0,
+                dtype="int32",
+            )
+            ccd = src.read(1, window=window)
+
+            rows, cols = np.nonzero(labels)
+            zones = labels[rows, cols]
+            vals = ccd[rows, cols]
+            areas = pixel_areas(src, window)[rows]
+
+            totals["pixels"] += np.bincount(zones, minlength=n_zones)
+            totals["area"] += np.bincount(zones, weights=areas, minlength=n_zones)
+
+            # damaged pixels of the zones
+            damaged = vals > 0
+            zones, vals, areas = zones[damaged], vals[damaged], areas[damaged]
+            totals["damaged"] += np.bincount(zones, minlength=n_zones)
+            totals["damaged_area"] += np.bincount(
+                zones, weights=areas, minlength=n_zones
+            )
+            totals["ccd_sum"] += np.bincount(zones, weights=vals, minlength=n_zones)
+
+            bins = np.clip(
+                np.searchsorted(breakpoints, vals, "right") - 1, 0, n_bins - 1
+            )
+            hist += np.bincount(zones * n_bins + bins, minlength=n_zones * n_bins)
+
+    # the label 0 stands for the pixels outside of the zones
+    stats = pd.DataFrame(
+        {
+            "pixels": totals["pixels"][1:].astype("int64"),
+            "area_m2": totals["area"][1:],
+            "damaged_pixels": totals["damaged"][1:].astype("int64"),
+            "damaged_area_m2": totals["damaged_area"][1:],
+            "damaged_fraction": totals["damaged"][1:]
+            / np.maximum(totals["pixels"][1:], 1),
+            "ccd_mean": totals["ccd_sum"][1:] / np.maximum(totals["damaged"][1:], 1),
+        },
+        index=zones_gdf.index,
+    )
+    hist = pd.DataFrame(
+        hist.reshape(n_zones, n_bins)[1:],
+        columns=_bin_names(pm.colour_breakpoints),
+        index=zones_gdf.index,
+    )
+
+    attributes = pd.DataFrame(zones_gdf.drop(columns=zones_gdf.geometry.name))
+
+    return pd.concat([attributes, stats, hist], axis=1)
+
+
+def export_zonal_stats(ccd_file, zones_gdf, dstnt_file):
+    """write the damage statistics of the zones of a CCD raster in a CSV file"""
+
+    zonal_stats(ccd_file, zones_gdf).to_csv(dstnt_file, index_label="zone")
+
+    return dstnt_file
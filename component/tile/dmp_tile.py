@@ -3,7 +3,7 @@ import ipyvuetify as v
 from sepal_ui.scripts import utils as su
 
 from component.widget.date_picker import DatePicker
-from component.scripts import *
+from component import scripts as cs
 
 
 class DmpTile(sw.Tile):
@@ -17,11 +17,43 @@ class DmpTile(sw.Tile):
         self.date_picker_end = DatePicker(label="End of event")
         self.username = v.TextField(label="Copernicus Scihub Username", v_model=None)
         self.password = sw.PasswordField(label="Copernicus Scihub Password")
+        self.dry_run = v.Switch(
+            label="Dry run (only estimate the data and processing time)",
+            v_model=False,
+        )
+        self.monitor = v.Switch(
+            label="Monitoring (extend the maps with the new acquisitions)",
+            v_model=False,
+        )
+        self.zones_file = sw.FileInput(
+            [".gpkg", ".geojson", ".shp"],
+            label="Zones of the damage statistics (optional, default to the AOI)",
+        )
+
+        # follow and control the runs
+        self.job = None
+        self.progress = v.ProgressLinear(value=0, height=4)
+        self.progress_label = v.Html(tag="span", children=[""])
+        self.cancel_btn = sw.Btn("Cancel")
+        self.cancel_btn.disabled = True
+        self.resume_btn = sw.Btn("Resume")
+        self.resume_btn.disabled = True
+        self.job_control = v.Layout(
+            column=True,
+            children=[
+                self.progress,
+                self.progress_label,
+                v.Layout(row=True, children=[self.cancel_btn, self.resume_btn]),
+            ],
+        )
 
         # bind them with the output
         self.model.bind(self.date_picker_start, "event_start").bind(
             self.date_picker_end, "event_end"
-        ).bind(self.username, "username").bind(self.password, "password")
+        ).bind(self.username, "username").bind(self.password, "password").bind(
+            self.dry_run, "dry_run"
+        )
+        self.model.bind(self.monitor, "monitor").bind(self.zones_file, "zones_file")
 
         # construct the tile
         super().__init__(
@@ -32,6 +64,10 @@ class DmpTile(sw.Tile):
                 self.date_picker_end,
                 self.username,
                 self.password,
+                self.dry_run,
+                self.monitor,
+                self.zones_file,
+                self.job_control,
             ],
             alert=sw.Alert(),
             btn=sw.Btn("Process"),
@@ -39,6 +75,8 @@ class DmpTile(sw.Tile):
 
         # link the click to an event
         self.btn.on_event("click", self._on_click)
+        self.cancel_btn.on_event("click", self._on_cancel)
+        self.resume_btn.on_event("click", self._on_resume)
 
     @su.loading_button()
     def _on_click(self, widget, data, event):
@@ -52,9 +90,67 @@ class DmpTile(sw.Tile):
         if not self.alert.check_input(self.model.password, "no password"):
             return
 
-        # check_computer_size()
-        create_dmp(self.aoi_model, self.model, self.alert)
+        # a dry run is meant to size the instance, it can run on a smaller one
+        if not self.model.dry_run:
+            cs.check_computer_size()
+
+        # the run is queued in a worker process so that the interface stays free
+        self.job = cs.DmpJob(self.aoi_model, self.model).on_event(self._on_job_event)
+        cs.job_queue.submit(self.job)
+
+        return
+
+    def _on_cancel(self, widget, data, event):
+        self.job.cancel()
+
+        return
+
+    def _on_resume(self, widget, data, event):
+        self.job = self.job.resume()
+        cs.job_queue.submit(self.job)
+
+        return
+
+    def _on_job_event(self, event):
+        """display the events of the runs in the alert and the progress bar"""
+
+        # the progress and controls only follow the last run
+        last = event["job"] == self.job.id
+
+        if event["kind"] == "message":
+            if event["live"]:
+                self.alert.add_live_msg(event["msg"], event["type_"])
+            else:
+                self.alert.append_msg(event["msg"], type_=event["type_"])
+
+        elif event["kind"] == "progress" and last:
+            self.progress.value = event["percent"]
+            eta = "" if event["eta"] is None else f", ~{event['eta'] // 60} min left"
+            self.progress_label.children = [
+                f"{event['stage']}: {event['percent']}%{eta}"
+            ]
+
+        elif event["kind"] == "status":
+            status = event["status"]
+            if status == "queued":
+                self.alert.append_msg(f"Run {event['job']} queued")
+            elif status == "done" and event["dry_run"]:
+                self.alert.append_msg(
+                    "Dry run complete, nothing was processed", type_="success"
+                )
+            elif status == "done":
+                self.alert.append_msg("Computation complete", type_="success")
+            elif status == "failed":
+                self.alert.append_msg(
+                    f"Run {event['job']} failed: {event['error']}", type_="error"
+                )
+            elif status == "cancelled":
+                self.alert.append_msg(f"Run {event['job']} cancelled", type_="warning")
 
-        self.alert.add_live_msg("Computation complete", "success")
+            if last:
+                self.cancel_btn.disabled = status not in ["queued", "running"]
+                self.resume_btn.disabled = status not in ["failed", "cancelled"]
+                if status == "done":
+                    self.progress.value = 100
 
         return
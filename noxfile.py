@@ -75,3 +75,10 @@ def jupyter(session):
     session.install("-r", "requirements.txt")
     session.run("jupyter", "trust", "no_ui.ipynb")
     session.run("jupyter", "notebook", "no_ui.ipynb")
+
+
+@nox.session(reuse_venv=True)
+def bench(session):
+    """Run the offline benchmark of the post-processing stages."""
+    session.install("-r", "requirements.txt")
+    session.run("python", "-m", "component.scripts.benchmark", *session.posargs)